@@ -1,11 +1,21 @@
 # -*- encoding: utf-8 -*-
+import argparse
+import asyncio
 import attr
+import collections
 import fnmatch
+import gzip
+import hashlib
 import json
+import numpy as np
 import pathlib
 import requests
+import ssl
+import time
 import yaml
 
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
 from http import HTTPStatus
 from os import environ
 from rich import print as rprint
@@ -15,6 +25,31 @@ from rich.pretty import pprint
 
 console = Console()
 DEFAULT_PILLAR = "kb"
+HISTORY_FILE_NAME = "history.jsonl.gz"
+# pillar for droplets which are not linked to a domain
+HISTORY_UNALLOCATED = "-"
+# warn if a certificate expires within this number of days
+SWEEP_EXPIRY_DAYS = 21
+# maximum number of open connections (overall and to one minion)
+SWEEP_LIMIT = 200
+SWEEP_LIMIT_PER_HOST = 10
+# seconds
+SWEEP_TIMEOUT = 10
+METRICS_DAYS = 14
+METRICS_FILE_NAME = "metrics.npz"
+METRICS_WORKERS = 16
+# one row per sample (the columns are percentages and Mbps)
+METRICS_DTYPE = np.dtype(
+    [
+        ("timestamp", "<i8"),
+        ("cpu", "<f4"),
+        ("memory", "<f4"),
+        ("bandwidth", "<f4"),
+    ]
+)
+# a server is oversized if the 95th percentile is below these values
+OVERSIZED_CPU = 20
+OVERSIZED_MEMORY = 50
 
 
 @attr.s
@@ -28,6 +63,146 @@ class Droplet:
     domains = attr.ib()
 
 
+@attr.s
+class DomainHealth:
+    domain_name = attr.ib()
+    minion = attr.ib()
+    ssl = attr.ib()
+    status = attr.ib(default=None)
+    # seconds
+    latency = attr.ib(default=None)
+    expires = attr.ib(default=None)
+    issuer = attr.ib(default=None)
+    error = attr.ib(default=None)
+
+    def days_to_expiry(self, now):
+        result = None
+        if self.expires:
+            result = (self.expires - now).days
+        return result
+
+
+async def _check_domain(
+    domain_name, config, connect_to, ssl_context, limit, host_limits, timeout
+):
+    """TLS handshake and HTTP request for a single domain.
+
+    ``connect_to`` maps a domain name to a ``(host, port)`` tuple, so we can
+    check the domains against local test servers.
+
+    """
+    is_ssl = "ssl" in config
+    result = DomainHealth(
+        domain_name=domain_name, minion=config["minion"], ssl=is_ssl
+    )
+    host, port = connect_to.get(
+        domain_name, (domain_name, 443 if is_ssl else 80)
+    )
+    # wait for the minion first, so a task waiting for a busy minion does not
+    # hold one of the overall connections
+    async with host_limits[result.minion], limit:
+        start = time.monotonic()
+        try:
+            reader, writer = await asyncio.wait_for(
+                asyncio.open_connection(
+                    host,
+                    port,
+                    ssl=ssl_context if is_ssl else None,
+                    server_hostname=domain_name if is_ssl else None,
+                ),
+                timeout,
+            )
+            try:
+                if is_ssl:
+                    certificate = writer.get_extra_info("peercert")
+                    result.expires = datetime.fromtimestamp(
+                        ssl.cert_time_to_seconds(certificate["notAfter"]),
+                        tz=timezone.utc,
+                    )
+                    issuer = dict(x[0] for x in certificate["issuer"])
+                    result.issuer = issuer.get(
+                        "organizationName", issuer.get("commonName")
+                    )
+                writer.write(
+                    "HEAD / HTTP/1.1\r\nHost: {}\r\n"
+                    "User-Agent: domain-config\r\n"
+                    "Connection: close\r\n\r\n".format(domain_name).encode()
+                )
+                await writer.drain()
+                line = await asyncio.wait_for(reader.readline(), timeout)
+                # e.g. 'HTTP/1.1 200 OK'
+                result.status = int(line.split()[1])
+                result.latency = time.monotonic() - start
+            finally:
+                writer.close()
+        except (
+            asyncio.TimeoutError,
+            IndexError,
+            # a missing (or empty) 'peercert' e.g. 'CERT_NONE'
+            KeyError,
+            OSError,
+            ssl.SSLError,
+            TypeError,
+            ValueError,
+        ) as e:
+            result.error = str(e) or e.__class__.__name__
+    return result
+
+
+async def _sweep_domains(
+    domains, connect_to, ssl_context, limit, limit_per_host, timeout
+):
+    overall = asyncio.Semaphore(limit)
+    host_limits = collections.defaultdict(
+        lambda: asyncio.Semaphore(limit_per_host)
+    )
+    return await asyncio.gather(
+        *[
+            _check_domain(
+                domain_name,
+                config,
+                connect_to,
+                ssl_context,
+                overall,
+                host_limits,
+                timeout,
+            )
+            for domain_name, config in domains.items()
+        ]
+    )
+
+
+def display_domain_health(result, expiry_days):
+    now = datetime.now(timezone.utc)
+    expiring = []
+    failing = []
+    for health in result:
+        days = health.days_to_expiry(now)
+        if health.error or (health.status and health.status >= 500):
+            failing.append(health)
+        elif days is not None and days < expiry_days:
+            expiring.append((days, health))
+    print()
+    rprint(
+        "[yellow]Checked {} domains ({} failing, {} expiring within {} "
+        "days)".format(len(result), len(failing), len(expiring), expiry_days)
+    )
+    for health in failing:
+        rprint(
+            "[red]- {} ({}): {}".format(
+                health.domain_name,
+                health.minion,
+                health.error or "HTTP {}".format(health.status),
+            )
+        )
+    for days, health in sorted(expiring, key=lambda x: x[0]):
+        rprint(
+            "[cyan]- {} ({}): expires in {} days ({})".format(
+                health.domain_name, health.minion, days, health.issuer
+            )
+        )
+
+
 def display_domains(domains):
     count = 0
     for domain_name, config in domains.items():
@@ -123,10 +298,140 @@ def get_digital_ocean():
     # return dict(sorted(result.items()))
 
 
+def _metrics_columns(**columns):
+    """Align each ``(timestamps, values)`` column into a ``METRICS_DTYPE``.
+
+    The columns may not have the same timestamps, so missing samples are
+    set to ``nan``.  If there are no samples at all (e.g. a droplet without
+    the metrics agent), the array is empty.
+
+    """
+    columns = {k: v for k, v in columns.items() if len(v[0])}
+    timestamps = np.unique(
+        np.concatenate(
+            [x[0] for x in columns.values()] + [np.array([], dtype=np.int64)]
+        ).astype(np.int64)
+    )
+    result = np.zeros(len(timestamps), dtype=METRICS_DTYPE)
+    result["timestamp"] = timestamps
+    for name in ("cpu", "memory", "bandwidth"):
+        result[name] = np.nan
+        if name in columns:
+            x, y = columns[name]
+            result[name][np.searchsorted(timestamps, x)] = y
+    return result
+
+
+class DigitalOceanMetrics:
+    """Droplet metrics from the Digital Ocean monitoring API.
+
+    https://docs.digitalocean.com/reference/api/api-reference/#tag/Monitoring
+
+    """
+
+    def __init__(self, api_url_base=None):
+        self.api_token = environ["DIGITAL_OCEAN_TOKEN"]
+        self.api_url_base = api_url_base or "https://api.digitalocean.com/v2/"
+        self.headers = {
+            "Content-Type": "application/json",
+            "Authorization": "Bearer {0}".format(self.api_token),
+        }
+
+    def _get(self, metric, droplet, start, end, **kwargs):
+        api_url = "{}monitoring/metrics/droplet/{}".format(
+            self.api_url_base, metric
+        )
+        params = {
+            "host_id": droplet.droplet_id,
+            "start": int(start.timestamp()),
+            "end": int(end.timestamp()),
+        }
+        params.update(kwargs)
+        response = requests.get(api_url, headers=self.headers, params=params)
+        if response.status_code == HTTPStatus.OK:
+            data = json.loads(response.content.decode("utf-8"))
+        else:
+            raise Exception(
+                "Error from the Digital Ocean monitoring API ('{}'): {}".format(
+                    metric, response.status_code
+                )
+            )
+        return data["data"]["result"]
+
+    def _values(self, series):
+        values = np.array(series["values"], dtype=np.float64).reshape(-1, 2)
+        return values[:, 0].astype(np.int64), values[:, 1]
+
+    def get_metrics(self, droplet, start, end):
+        """The metrics for a droplet.
+
+        A droplet without the metrics agent has no results, so the columns
+        are only added if there is data.
+
+        """
+        columns = {}
+        # cpu - seconds spent in each mode (counters), so use the difference
+        cpu = self._get("cpu", droplet, start, end)
+        if cpu:
+            size = min(len(x["values"]) for x in cpu)
+            modes = np.array(
+                [
+                    np.array(x["values"][:size], dtype=np.float64).reshape(
+                        -1, 2
+                    )[:, 1]
+                    for x in cpu
+                ]
+            )
+            is_idle = [x["metric"].get("mode") == "idle" for x in cpu]
+            idle = modes[is_idle].sum(axis=0)
+            total = np.diff(modes.sum(axis=0))
+            with np.errstate(divide="ignore", invalid="ignore"):
+                cpu_percent = 100 * (1 - np.diff(idle) / total)
+            cpu_timestamps = np.array(
+                [x[0] for x in cpu[0]["values"][1:size]], dtype=np.int64
+            )
+            columns["cpu"] = (cpu_timestamps, cpu_percent)
+        # memory
+        available = self._get("memory_available", droplet, start, end)
+        memory_total = self._get("memory_total", droplet, start, end)
+        if available and memory_total:
+            memory_timestamps, available = self._values(available[0])
+            _, memory_total = self._values(memory_total[0])
+            size = min(len(available), len(memory_total))
+            with np.errstate(divide="ignore", invalid="ignore"):
+                memory_percent = 100 * (
+                    1 - available[:size] / memory_total[:size]
+                )
+            columns["memory"] = (memory_timestamps[:size], memory_percent)
+        # bandwidth (Mbps)
+        bandwidth = self._get(
+            "bandwidth",
+            droplet,
+            start,
+            end,
+            interface="public",
+            direction="outbound",
+        )
+        if bandwidth:
+            columns["bandwidth"] = self._values(bandwidth[0])
+        return _metrics_columns(**columns)
+
+
+@attr.s
+class History:
+    """Trends for each pillar (one row per snapshot, one column per pillar)."""
+
+    created = attr.ib()
+    pillars = attr.ib()
+    cost = attr.ib()
+    domain_count = attr.ib()
+    minion_count = attr.ib()
+
+
 class Linode:
-    def __init__(self):
+    def __init__(self, api_url_base=None):
         self.api_token = environ["LINODE_TOKEN"]
-        self.api_url_base = "https://api.linode.com/v4/linode/"
+        self.api_url_base = api_url_base or "https://api.linode.com/v4/linode/"
         self.headers = {
             "Content-Type": "application/json",
             "Authorization": "Bearer {0}".format(self.api_token),
@@ -194,6 +499,69 @@ class Linode:
                 )
         return self.linode_types["linode_type"]
 
+    def get_metrics(self, droplet, start, end):
+        """Statistics for the last 24 hours (``start`` and ``end`` are ignored).
+
+        https://www.linode.com/docs/api/linode-instances/#linode-statistics-view
+
+        .. note:: Linode does not report memory usage.
+
+        """
+        api_url = "{}instances/{}/stats".format(
+            self.api_url_base, droplet.droplet_id
+        )
+        response = requests.get(api_url, headers=self.headers)
+        if response.status_code == HTTPStatus.OK:
+            data = json.loads(response.content.decode("utf-8"))["data"]
+        else:
+            raise Exception(
+                "Error from the Linode stats API: {}".format(
+                    response.status_code
+                )
+            )
+        # timestamps are in milliseconds
+        cpu = np.array(data["cpu"], dtype=np.float64).reshape(-1, 2)
+        out = np.array(data["netv4"]["out"], dtype=np.float64).reshape(-1, 2)
+        return _metrics_columns(
+            cpu=(cpu[:, 0] // 1000, cpu[:, 1]),
+            # bits per second to Mbps
+            bandwidth=(out[:, 0] // 1000, out[:, 1] / 1000000),
+        )
+
+
+def get_metrics(provider, droplets, days=METRICS_DAYS):
+    """Fetch the metrics for each droplet (concurrently).
+
+    An error for one droplet does not stop the others.  A droplet with no
+    samples (e.g. without the metrics agent) is an error (``no data``).
+
+    Returns a ``dict`` of ``METRICS_DTYPE`` arrays and a ``dict`` of errors
+    (both keyed on the minion).
+
+    """
+    end = datetime.now(timezone.utc)
+    start = end - timedelta(days=days)
+
+    def _get_metrics(droplet):
+        try:
+            return provider.get_metrics(droplet, start, end), None
+        except Exception as e:
+            return None, str(e)
+
+    metrics = {}
+    errors = {}
+    with ThreadPoolExecutor(max_workers=METRICS_WORKERS) as executor:
+        for droplet, (data, error) in zip(
+            droplets, executor.map(_get_metrics, droplets)
+        ):
+            if error:
+                errors[droplet.minion] = error
+            elif not len(data):
+                errors[droplet.minion] = "no data"
+            else:
+                metrics[droplet.minion] = data
+    return metrics, errors
+
 
 def get_domains():
     """Get the config for each site (domain name) from the Salt pillar."""
@@ -213,6 +581,34 @@ def get_domains():
     return result
 
 
+def sweep_domains(
+    domains,
+    connect_to=None,
+    ssl_context=None,
+    limit=SWEEP_LIMIT,
+    limit_per_host=SWEEP_LIMIT_PER_HOST,
+    timeout=SWEEP_TIMEOUT,
+):
+    """Check the TLS certificate and HTTP status of every domain.
+
+    The checks run concurrently, limited by the number of connections
+    overall (``limit``) and to each minion (``limit_per_host``).
+
+    Returns a list of ``DomainHealth`` (in the same order as ``domains``).
+
+    """
+    return asyncio.run(
+        _sweep_domains(
+            domains,
+            connect_to or {},
+            ssl_context or ssl.create_default_context(),
+            limit,
+            limit_per_host,
+            timeout,
+        )
+    )
+
+
 def get_wildcard(pillar_folder):
     """Get the config for the wildcard include files.
 
@@ -303,6 +699,54 @@ def get_domain_names(pillar_folder, wildcard, pillar):
     return result
 
 
+def _history_snapshot(domains, droplets):
+    """The data we keep in the history (stored as columns).
+
+    The pillar of a droplet is the pillar of its first domain.
+
+    """
+    return {
+        "domain": list(domains),
+        "minion": [x["minion"] for x in domains.values()],
+        "pillar": [x["pillar"] for x in domains.values()],
+        "droplet_minion": [x.minion for x in droplets],
+        "droplet_price": [x.price_monthly for x in droplets],
+        "droplet_pillar": [
+            domains[x.domains[0]]["pillar"]
+            if x.domains and x.domains[0] in domains
+            else HISTORY_UNALLOCATED
+            for x in droplets
+        ],
+    }
+
+
+def append_history(domains, droplets, file_name=HISTORY_FILE_NAME):
+    """Append a snapshot to the (gzip compressed) history.
+
+    Each snapshot is a single line of JSON in its own gzip member, so we can
+    append without re-writing the file.  The snapshot is not added if it
+    is the same as the previous one.
+
+    """
+    snapshot = _history_snapshot(domains, droplets)
+    digest = hashlib.sha256(
+        json.dumps(snapshot, sort_keys=True).encode()
+    ).hexdigest()
+    previous = None
+    for previous in read_history(file_name):
+        pass
+    if previous and previous["digest"] == digest:
+        rprint("[yellow]3. history has not changed since the last run...")
+        return False
+    snapshot.update(
+        {"created": datetime.now(timezone.utc).isoformat(), "digest": digest}
+    )
+    with gzip.open(file_name, "at") as f:
+        f.write(json.dumps(snapshot, separators=(",", ":")) + "\n")
+    rprint("[yellow]3. 'append_history' to '{}'...".format(file_name))
+    return True
+
+
 def json_dump_domains(domains):
     # file_name = "temp.json"
     # with open(file_name, "w") as f:
@@ -335,6 +779,190 @@ def json_dump_droplets(droplets):
     rprint("[yellow]2. 'json_dump_droplets' to '{}'...".format(file_name))
 
 
+def load_metrics(file_name=METRICS_FILE_NAME):
+    result = {}
+    if pathlib.Path(file_name).exists():
+        with np.load(file_name) as data:
+            result = {minion: data[minion] for minion in data.files}
+    return result
+
+
+def read_history(file_name=HISTORY_FILE_NAME):
+    """Iterate over the snapshots in the history (oldest first)."""
+    if pathlib.Path(file_name).exists():
+        with gzip.open(file_name, "rt") as f:
+            for line in f:
+                yield json.loads(line)
+
+
+def save_metrics(metrics, file_name=METRICS_FILE_NAME):
+    """Merge the new samples into the time series for each minion.
+
+    The file is only written if there are new samples.
+
+    """
+    data = load_metrics(file_name)
+    is_changed = False
+    for minion, samples in metrics.items():
+        if not len(samples):
+            continue
+        if minion in data:
+            samples = np.concatenate([data[minion], samples])
+        # sort by timestamp and remove duplicate samples
+        _, index = np.unique(samples["timestamp"], return_index=True)
+        samples = samples[index]
+        # compare the bytes ('nan' is not equal to 'nan')
+        if minion not in data or data[minion].tobytes() != samples.tobytes():
+            data[minion] = samples
+            is_changed = True
+    if is_changed:
+        with open(file_name, "wb") as f:
+            np.savez_compressed(f, **data)
+        rprint("[yellow]'save_metrics' to '{}'...".format(file_name))
+    return data
+
+
+def right_sizing(metrics):
+    """Summary of usage for each minion (using the 95th percentile).
+
+    Returns a structured array sorted by minion name.
+
+    """
+    minions = sorted(metrics)
+    result = np.zeros(
+        len(minions),
+        dtype=[
+            ("minion", "U64"),
+            ("samples", "<i8"),
+            ("cpu", "<f4"),
+            ("memory", "<f4"),
+            ("bandwidth", "<f4"),
+            ("oversized", "?"),
+        ],
+    )
+    result["minion"] = minions
+    for index, minion in enumerate(minions):
+        samples = metrics[minion]
+        result["samples"][index] = len(samples)
+        for name in ("cpu", "memory", "bandwidth"):
+            column = samples[name]
+            if len(column) and not np.isnan(column).all():
+                result[name][index] = np.nanpercentile(column, 95)
+            else:
+                result[name][index] = np.nan
+    # no cpu data is never oversized, no memory data (Linode) uses the cpu
+    result["oversized"] = (result["cpu"] < OVERSIZED_CPU) & ~(
+        result["memory"] >= OVERSIZED_MEMORY
+    )
+    return result
+
+
+def display_metrics_errors(errors):
+    if errors:
+        print()
+        rprint(
+            "[red]Cannot get the metrics for {} servers...".format(len(errors))
+        )
+        for minion, error in sorted(errors.items()):
+            rprint("[red]- {}: {}".format(minion, error))
+
+
+def display_right_sizing(summary, droplets):
+    price = {x.minion: x.price_monthly for x in droplets}
+    print()
+    rprint("[cyan]Usage for each server (95th percentile)...")
+    rprint(
+        "[white]{:<30} {:>8} {:>8} {:>8} {:>10} {:>8}".format(
+            "minion", "cpu %", "mem %", "Mbps", "samples", "price"
+        )
+    )
+    for row in summary:
+        rprint(
+            "[{}]{:<30} {:>8.1f} {:>8.1f} {:>8.2f} {:>10} {:>8}".format(
+                "red" if row["oversized"] else "white",
+                row["minion"],
+                row["cpu"],
+                row["memory"],
+                row["bandwidth"],
+                row["samples"],
+                price.get(row["minion"], ""),
+            )
+        )
+    rprint(
+        "[yellow]{} servers may be oversized (cpu below {}% and memory "
+        "below {}%)".format(
+            summary["oversized"].sum(), OVERSIZED_CPU, OVERSIZED_MEMORY
+        )
+    )
+
+
+def display_history(history, trend):
+    data = {
+        "cost": history.cost,
+        "domains": history.domain_count,
+        "minions": history.minion_count,
+    }[trend]
+    print()
+    rprint("[cyan]'{}' for each pillar...".format(trend))
+    rprint(
+        "[white]{:<12}".format("date")
+        + "".join("{:>10}".format(x) for x in history.pillars)
+        + "{:>10}".format("total")
+    )
+    for created, row in zip(history.created, data):
+        rprint(
+            "[white]{:<12}".format(str(created.astype("datetime64[D]")))
+            + "".join("{:>10.0f}".format(x) for x in row)
+            + "{:>10.0f}".format(row.sum())
+        )
+
+
+def load_history(file_name=HISTORY_FILE_NAME):
+    """Load the history into arrays of cost, domains and minions per pillar."""
+    created = []
+    # one entry per domain (or droplet) in every snapshot
+    domain_snapshot, domain_pillar, domain_minion = [], [], []
+    droplet_snapshot, droplet_pillar, droplet_price = [], [], []
+    for index, snapshot in enumerate(read_history(file_name)):
+        created.append(snapshot["created"][:19])
+        domain_snapshot.append(np.full(len(snapshot["domain"]), index))
+        domain_pillar.extend(snapshot["pillar"])
+        domain_minion.extend(snapshot["minion"])
+        droplet_snapshot.append(np.full(len(snapshot["droplet_price"]), index))
+        droplet_pillar.extend(snapshot["droplet_pillar"])
+        droplet_price.extend(snapshot["droplet_price"])
+    domain_snapshot = np.concatenate(domain_snapshot or [[]]).astype(int)
+    droplet_snapshot = np.concatenate(droplet_snapshot or [[]]).astype(int)
+    count = len(domain_pillar)
+    pillars, codes = np.unique(
+        np.array(domain_pillar + droplet_pillar, dtype=str),
+        return_inverse=True,
+    )
+    domain_pillar, droplet_pillar = codes[:count], codes[count:]
+    shape = (len(created), len(pillars))
+    cost = np.zeros(shape)
+    np.add.at(cost, (droplet_snapshot, droplet_pillar), droplet_price)
+    domain_count = np.zeros(shape, dtype=np.int64)
+    np.add.at(domain_count, (domain_snapshot, domain_pillar), 1)
+    # count each minion once per snapshot and pillar
+    minion_names, minion_codes = np.unique(
+        np.array(domain_minion, dtype=str), return_inverse=True
+    )
+    key = np.unique(
+        (domain_snapshot * len(pillars) + domain_pillar) * len(minion_names)
+        + minion_codes
+    ) // len(minion_names)
+    minion_count = np.zeros(shape, dtype=np.int64)
+    np.add.at(minion_count, (key // len(pillars), key % len(pillars)), 1)
+    return History(
+        created=np.array(created, dtype="datetime64[s]"),
+        pillars=[str(x) for x in pillars],
+        cost=cost,
+        domain_count=domain_count,
+        minion_count=minion_count,
+    )
+
+
 def match_minion(minion_id, salt_top):
     """Copied from ``_match`` (see ``lib/pillarinfo.py`` in ``fabric``."""
     result = False
@@ -416,6 +1044,7 @@ def main():
         if minion_id in minions:
             droplet.domains = minions.pop(minion_id)
     json_dump_droplets(droplets)
+    append_history(domains, droplets)
 
     # use the tag to link droplets to a contact
     # contacts = {}
@@ -437,4 +1066,56 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(
+        description="Find the configuration for each site / domain"
+    )
+    parser.add_argument(
+        "--sweep",
+        action="store_true",
+        help="check the certificate and HTTP status of every domain",
+    )
+    parser.add_argument(
+        "--expiry-days",
+        type=int,
+        default=SWEEP_EXPIRY_DAYS,
+        help="warn if a certificate expires within this number of days",
+    )
+    parser.add_argument(
+        "--metrics",
+        action="store_true",
+        help="fetch cpu, memory and bandwidth usage for each server",
+    )
+    parser.add_argument(
+        "--metrics-days",
+        type=int,
+        default=METRICS_DAYS,
+        help="number of days of metrics to fetch (Digital Ocean only)",
+    )
+    parser.add_argument(
+        "--history",
+        choices=["cost", "domains", "minions"],
+        help="display the trend for each pillar (from the history)",
+    )
+    args = parser.parse_args()
+    if args.history:
+        display_history(load_history(), args.history)
+    elif args.sweep:
+        domains = dict(sorted(get_domains().items()))
+        display_domain_health(sweep_domains(domains), args.expiry_days)
+    elif args.metrics:
+        digital_ocean = get_digital_ocean()
+        linode = Linode()
+        linodes = linode.get_linodes()
+        metrics, errors = get_metrics(
+            DigitalOceanMetrics(), digital_ocean, args.metrics_days
+        )
+        linode_metrics, linode_errors = get_metrics(
+            linode, linodes, args.metrics_days
+        )
+        metrics.update(linode_metrics)
+        errors.update(linode_errors)
+        metrics = save_metrics(metrics)
+        display_right_sizing(right_sizing(metrics), digital_ocean + linodes)
+        display_metrics_errors(errors)
+    else:
+        main()
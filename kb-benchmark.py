@@ -0,0 +1,442 @@
+# -*- encoding: utf-8 -*-
+"""Benchmarks for ``kb.py``.
+
+``kb.py --version-txt`` and ``kb.py --version-config`` are run by the
+front-end build scripts (many times a day), so they must start quickly.
+
+The git checks are measured using a synthetic workspace (``--generate``)
+with a project and apps (each with thousands of commits and a release at
+each of the ``--depths``).
+
+Usage::
+
+  python kb-benchmark.py --startup
+
+  python kb-benchmark.py --generate ~/bench/ --apps 20 --commits 5000
+  python kb-benchmark.py --checks ~/bench/ --jobs 8
+
+"""
+
+import argparse
+import importlib.util
+import json
+import logging
+import os
+import pathlib
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import timeit
+
+KB_PY = pathlib.Path(__file__).resolve().parent.joinpath("kb.py")
+# written by 'generate', so we know the folder can be removed
+MARKER = "kb-benchmark.txt"
+# the slow modules which should not be imported by the fast paths
+SLOW_IMPORTS = [
+    "git",
+    "numpy",
+    "pkg_resources",
+    "requests",
+    "rich",
+    "semantic_version",
+    "walkdir",
+    "yaml",
+]
+# the project in a synthetic workspace (see 'generate')
+PROJECT = "benchmark"
+# milliseconds (more than 'python -c pass').  The fast paths take about
+# 70 ms (most of it importing 'attr'), so this allows for a noisy machine
+STARTUP_BUDGET = 120
+STARTUP_COMMANDS = [["--version-txt"], ["--version-config"]]
+
+
+def _create_front_end(folder):
+    """A folder with the files used by ``--version-txt``."""
+    with open(os.path.join(folder, "package.json"), "w") as f:
+        json.dump({"name": "benchmark", "version": "1.2.3"}, f)
+    for name in ("config", "dist"):
+        os.makedirs(os.path.join(folder, name), exist_ok=True)
+    with open(os.path.join(folder, "config", "environment.js"), "w") as f:
+        f.write("      currentVersion: '1.2.2',\n")
+
+
+def _fast_import(folder, commits, depths):
+    """Create the commits for an app using ``git fast-import``.
+
+    A release commit (e.g. ``version 0.1.03``) is created at each of the
+    ``depths`` (the number of commits from the head of the branch).
+
+    Returns a list of the release versions (newest first).
+
+    """
+    result = []
+    releases = sorted(x for x in depths if x < commits)
+    versions = {
+        commits - 1 - depth: "0.1.{:02d}".format(len(releases) - count)
+        for count, depth in enumerate(releases)
+    }
+    lines = []
+    start = int(time.time()) - commits
+    for count in range(commits):
+        version = versions.get(count)
+        if version:
+            message = "version {}".format(version)
+            result.insert(0, version)
+        else:
+            message = "change {}".format(count)
+        content = "{}\n".format(count)
+        lines.extend(
+            [
+                "commit refs/heads/master",
+                "committer Benchmark <benchmark@example.com> {} +0000".format(
+                    start + count
+                ),
+                "data {}".format(len(message)),
+                message,
+                "M 644 inline file-{}.txt".format(count % 20),
+                "data {}".format(len(content)),
+                content,
+            ]
+        )
+    subprocess.run(
+        ["git", "init", "--quiet", "--initial-branch", "master", folder],
+        check=True,
+    )
+    subprocess.run(
+        ["git", "-C", folder, "fast-import", "--quiet"],
+        input="\n".join(lines) + "\n",
+        text=True,
+        check=True,
+    )
+    subprocess.run(
+        ["git", "-C", folder, "checkout", "--quiet", "master"], check=True
+    )
+    return result
+
+
+def _import_kb():
+    """Import ``kb.py`` (the name is not a valid module name for the tests)."""
+    spec = importlib.util.spec_from_file_location("kb", KB_PY)
+    result = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(result)
+    result.logger.setLevel(logging.WARNING)
+    return result
+
+
+def _run_times(command, folder, runs):
+    """The time (in milliseconds) to run ``command`` ``runs`` times."""
+    result = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        # 'kb.py' exits with a message (so the return code is 1)
+        subprocess.run(
+            command,
+            cwd=folder,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        result.append((time.perf_counter() - start) * 1000)
+    return result
+
+
+def import_times(command, folder):
+    """The top level modules imported by ``kb.py`` (using ``-X importtime``).
+
+    Returns a dict of the module name and the cumulative time (in
+    milliseconds).
+
+    """
+    result = {}
+    out = subprocess.run(
+        [sys.executable, "-X", "importtime", str(KB_PY)] + command,
+        cwd=folder,
+        capture_output=True,
+        text=True,
+    )
+    for line in out.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")
+        # a top level import is not indented
+        if not name.startswith("  "):
+            result[name.strip()] = int(cumulative) / 1000
+    return result
+
+
+def checks(folder, jobs, runs, cold=False):
+    """Time the git checks for the project in a synthetic workspace.
+
+    The checks are run one app at a time and then in a pool of ``jobs``
+    threads.  The apps are opened again for each run (so the status and
+    log are not saved between runs).
+
+    Keyword arguments:
+    cold -- remove the release index (``kb-release-index.json``) before
+            each run, so the history of each app is walked
+
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    kb = _import_kb()
+    project = os.path.join(folder, "project", PROJECT)
+    ci_apps, production_apps = kb.check_requirements(True, project)
+    tags = {x.name: x.semantic_version for x in production_apps}
+    print(
+        "{} apps, {} runs{}".format(
+            len(ci_apps), runs, " (cold)" if cold else ""
+        )
+    )
+    print()
+    print(
+        "{:<10} {:>10} {:>10} {:>10} {:>10} {:>10}".format(
+            "jobs", "total", "app min", "median", "p90", "max"
+        )
+    )
+    for count in sorted(set([1, jobs])):
+        totals = []
+        latency = []
+        for _ in range(runs):
+            with kb.Workspace(folder) as workspace:
+                if cold:
+                    for app in ci_apps:
+                        pathlib.Path(
+                            workspace.repo(app).git_dir,
+                            kb.FILENAME_RELEASE_INDEX,
+                        ).unlink(missing_ok=True)
+
+                def _check(app):
+                    start = time.perf_counter()
+                    result = kb.git_check(
+                        app, tags, True, False, False, workspace=workspace
+                    )
+                    if result.error:
+                        raise kb.KbError(result.error)
+                    return time.perf_counter() - start
+
+                start = time.perf_counter()
+                with ThreadPoolExecutor(max_workers=count) as executor:
+                    latency = latency + list(executor.map(_check, ci_apps))
+                totals.append(time.perf_counter() - start)
+        latency = sorted(x * 1000 for x in latency)
+        print(
+            "{:<10} {:>7.1f} ms {:>7.1f} ms {:>7.1f} ms {:>7.1f} ms "
+            "{:>7.1f} ms".format(
+                count,
+                statistics.median(totals) * 1000,
+                latency[0],
+                statistics.median(latency),
+                latency[int(len(latency) * 0.9)],
+                latency[-1],
+            )
+        )
+    print()
+    number = 1000
+    for name, function in (
+        ("ci", lambda: kb.ci(project)),
+        ("branch", lambda: kb.branch("branch.txt", folder=project)),
+        ("local", lambda: kb.local(True, project)),
+        ("production", lambda: kb.production(project)),
+        ("tag_to_semver", lambda: kb.tag_to_semver("0.2.05")),
+    ):
+        seconds = min(timeit.repeat(function, number=number, repeat=3))
+        print("{:<20} {:>10.1f} us".format(name, seconds / number * 1000000))
+
+
+def generate(folder, apps, commits, depths, force=False):
+    """Create a synthetic workspace (a project with ``apps`` apps).
+
+    Each app has ``commits`` commits with a release at each of the
+    ``depths``.  The project uses a different release of each app (so the
+    tag is found at a different depth).
+
+    A folder which is not empty is only removed if it was created by
+    ``generate`` (or ``force`` is set), so a typo cannot remove a real
+    workspace.
+
+    """
+    if not any(x < commits for x in depths):
+        raise ValueError(
+            "At least one of the depths ({}) must be less than the number "
+            "of commits ({})".format(
+                ", ".join(str(x) for x in depths), commits
+            )
+        )
+    if os.path.exists(folder) and os.listdir(folder):
+        if not (force or os.path.exists(os.path.join(folder, MARKER))):
+            raise ValueError(
+                "'{}' is not empty (and was not created by '--generate'). "
+                "Use '--force' to remove it".format(folder)
+            )
+        shutil.rmtree(folder)
+    project = os.path.join(folder, "project", PROJECT)
+    os.makedirs(os.path.join(project, "requirements"))
+    with open(os.path.join(folder, MARKER), "w") as f:
+        f.write("Created by 'kb-benchmark.py --generate'\n")
+    requirements = {
+        "base.txt": ["Django"],
+        "branch.txt": [],
+        "ci.txt": ["-r base.txt"],
+        "local.txt": ["-r base.txt"],
+        "production.txt": ["-r base.txt"],
+    }
+    for count in range(apps):
+        name = "app-{:03d}".format(count)
+        start = time.perf_counter()
+        versions = _fast_import(
+            os.path.join(folder, "app", name), commits, depths
+        )
+        # use a different release for each app
+        version = versions[count % len(versions)]
+        requirements["branch.txt"].append("{}|master".format(name))
+        requirements["ci.txt"].append(
+            "-e git+https://gitlab.com/kb/{0}.git#egg=kb-{0}".format(name)
+        )
+        requirements["local.txt"].append("-e ../../app/{}".format(name))
+        requirements["production.txt"].append(
+            "kb-{}=={}".format(name, version)
+        )
+        print(
+            "{:<10} {} commits, {} releases, using {} ({:.1f} seconds)".format(
+                name,
+                commits,
+                len(versions),
+                version,
+                time.perf_counter() - start,
+            )
+        )
+    for file_name, lines in requirements.items():
+        with open(os.path.join(project, "requirements", file_name), "w") as f:
+            f.write("\n".join(lines) + "\n")
+
+
+def startup(runs, budget):
+    """Check the fast paths start in less than ``budget`` milliseconds.
+
+    The budget is the time more than an empty Python process.  The fastest
+    run is used (the median includes the noise from other processes).
+
+    Returns ``True`` if every command is within the budget.
+
+    """
+    result = True
+    with tempfile.TemporaryDirectory() as folder:
+        _create_front_end(folder)
+        python = min(_run_times([sys.executable, "-c", "pass"], folder, runs))
+        print("python -c pass: {:.1f} ms (min of {})".format(python, runs))
+        print()
+        print(
+            "{:<20} {:>10} {:>10} {:>10}  {}".format(
+                "command", "median", "min", "kb.py", "status"
+            )
+        )
+        for command in STARTUP_COMMANDS:
+            times = _run_times(
+                [sys.executable, str(KB_PY)] + command, folder, runs
+            )
+            median = statistics.median(times)
+            imports = import_times(command, folder)
+            slow = sorted(
+                x for x in imports if x.split(".")[0] in SLOW_IMPORTS
+            )
+            ok = min(times) - python <= budget and not slow
+            print(
+                "{:<20} {:>7.1f} ms {:>7.1f} ms {:>7.1f} ms  {}".format(
+                    " ".join(command),
+                    median,
+                    min(times),
+                    min(times) - python,
+                    "ok" if ok else "FAILED",
+                )
+            )
+            if slow:
+                print("  slow imports: {}".format(", ".join(slow)))
+            for name, cumulative in sorted(
+                imports.items(), key=lambda x: x[1], reverse=True
+            )[:5]:
+                print("  {:<30} {:>7.1f} ms".format(name, cumulative))
+            result = result and ok
+    print()
+    print("budget: {} ms more than 'python -c pass'".format(budget))
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks for 'kb.py'")
+    parser.add_argument(
+        "--apps", type=int, default=10, help="number of apps (--generate)"
+    )
+    parser.add_argument(
+        "--checks",
+        metavar="FOLDER",
+        help="time the git checks for a synthetic workspace",
+    )
+    parser.add_argument(
+        "--cold",
+        action="store_true",
+        help="remove the release index before each run (--checks)",
+    )
+    parser.add_argument(
+        "--commits",
+        type=int,
+        default=2000,
+        help="number of commits for each app (--generate)",
+    )
+    parser.add_argument(
+        "--depths",
+        default="10,100,1000",
+        help="create a release at each depth e.g. '10,100,1000' (--generate)",
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="remove the folder even if it was not created by --generate",
+    )
+    parser.add_argument(
+        "--generate",
+        metavar="FOLDER",
+        help="create a synthetic workspace (a project and apps)",
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=os.cpu_count(),
+        help="number of apps to check at the same time (--checks)",
+    )
+    parser.add_argument(
+        "--startup",
+        action="store_true",
+        help="check the start up time of the fast paths (e.g. --version-txt)",
+    )
+    parser.add_argument(
+        "--runs", type=int, default=10, help="number of times to run each"
+    )
+    parser.add_argument(
+        "--budget",
+        type=int,
+        default=STARTUP_BUDGET,
+        help="start up budget in milliseconds (default {})".format(
+            STARTUP_BUDGET
+        ),
+    )
+    args = parser.parse_args()
+    if args.generate:
+        try:
+            generate(
+                args.generate,
+                args.apps,
+                args.commits,
+                [int(x) for x in args.depths.split(",")],
+                args.force,
+            )
+        except ValueError as e:
+            parser.error(str(e))
+    elif args.checks:
+        checks(args.checks, args.jobs, args.runs, args.cold)
+    elif args.startup:
+        if not startup(args.runs, args.budget):
+            sys.exit(1)
+    else:
+        parser.print_help()
@@ -1,32 +1,66 @@
 # -*- encoding: utf-8 -*-
 import argparse
 import attr
+import contextlib
+import fnmatch
 import glob
+import io
 import json
 import logging
 import os
 import pathlib
-import semantic_version
+import re
 import subprocess
-import yaml
+import sys
+import threading
+import time
 
-from git import Repo
-from pkg_resources import safe_name
-from rich import print as rprint
-from rich.prompt import Prompt
-from urllib.parse import urlparse
-from walkdir import filtered_walk
+from urllib.parse import urlparse, urlunparse
 
+# 'kb.py --version-txt' is run by the front-end build scripts, so the slow
+# imports ('rich', 'yaml', 'requests' etc) are inside the functions using them
 
+
+CACHE_FOLDER = pathlib.Path.home().joinpath(".cache", "kb")
+FILENAME_FRONT_END = "kb-front-end.json"
+FILENAME_RELEASE_INDEX = "kb-release-index.json"
 FILENAME_SETUP_YAML = "setup.yaml"
-GIT_COMMIT_COUNT = 100
+PYPIRC = pathlib.Path.home().joinpath(".pypirc")
+# number of apps to pull (or checkout) at the same time
+PULL_JOBS = 4
 logging.basicConfig(
     level=logging.INFO, format="%(asctime)s: %(levelname)s: %(message)s"
 )
+# the front-end (SCSS) files (see 'check_front_end')
+FRONT_END_OUTPUTS = ["*.css"]
+FRONT_END_SOURCES = [
+    "*.sass",
+    "*.scss",
+    "package-lock.json",
+    "package.json",
+    "yarn.lock",
+]
+# the first of these 'package.json' scripts is used to rebuild the SCSS
+FRONT_END_SCRIPTS = ["build-css", "build:css", "scss", "build"]
 logger = logging.getLogger(__name__)
+UPLOAD_RETRIES = 3
+# seconds
+UPLOAD_TIMEOUT = 120
+# the heads on each remote (see 'remote_heads')
+_remote_heads = {}
+_remote_heads_lock = threading.Lock()
+
+
+def rprint(*args, **kwargs):
+    """``rich.print`` (only import ``rich`` when we display something)."""
+    from rich import print
+
+    print(*args, **kwargs)
 
 
 def _file_exists_in_current_folder(file_name):
+    from rich.prompt import Prompt
+
     current_folder = pathlib.Path.cwd()
     file_name = pathlib.Path(current_folder, file_name)
     if file_name.is_file():
@@ -52,31 +86,39 @@ def _version_from_package_json():
     return data["version"]
 
 
-def check_ember_branches(ember_apps, checkout, pull):
+def check_ember_branches(ember_apps, checkout, pull, jobs=1, pull_jobs=None):
     rprint(f"[yellow]checking ember branches...")
     for counter, app in enumerate(ember_apps, start=1):
         rprint(f"[white]  {counter}. {app.name}")
-    git(ember_apps, [], False, args.checkout, args.pull)
+    return git(ember_apps, [], False, checkout, pull, jobs, pull_jobs)
 
 
 def create_dist_version_txt():
-    """Create 'dist/VERSION.txt' for 'ember-cli-new-version'."""
+    """Create 'dist/VERSION.txt' for 'ember-cli-new-version'.
+
+    This is run by the front-end build scripts, so it doesn't use ``rich``.
+
+    """
     file_name = pathlib.Path("dist", "VERSION.txt")
-    rprint(f"[yellow]Generate '{file_name}' for 'ember-cli-new-version'")
+    print(f"Generate '{file_name}' for 'ember-cli-new-version'")
     version = _version_from_package_json()
-    rprint(f"version: {version}")
-    rprint(f"[white]creating  {file_name}")
+    print(f"version: {version}")
+    print(f"creating  {file_name}")
     with open(file_name, "w") as f:
         f.write(version.strip())
     return version
 
 
 def update_config_environment():
-    """Update 'config/environment.js' for 'ember-cli-new-version'."""
+    """Update 'config/environment.js' for 'ember-cli-new-version'.
+
+    This is run by the front-end build scripts, so it doesn't use ``rich``.
+
+    """
     file_name = pathlib.Path("config", "environment.js")
     version = _version_from_package_json()
-    rprint(
-        f"[yellow]Update '{file_name}' to version {version} "
+    print(
+        f"Update '{file_name}' to version {version} "
         "for 'ember-cli-new-version'"
     )
     with open(file_name, "r") as f:
@@ -96,6 +138,464 @@ class App:
     branch = attr.ib()
     tag = attr.ib()
     semantic_version = attr.ib()
+    # the GIT repository (from 'ci.txt')
+    url = attr.ib(default=None)
+
+
+@attr.s
+class Archive:
+    """A file (sdist or wheel) ready to upload to a package index."""
+
+    file_name = attr.ib()
+    # e.g. 'sdist' or 'bdist_wheel'
+    filetype = attr.ib()
+    # e.g. 'source' or 'py3'
+    pyversion = attr.ib()
+    md5 = attr.ib()
+    sha256 = attr.ib()
+
+
+@attr.s
+class Commit:
+    sha = attr.ib()
+    author = attr.ib()
+    # the first line of the commit message
+    summary = attr.ib()
+
+
+class FileIndex:
+    """The folders and files for a release (found once and then shared).
+
+    Large folders which we never release (e.g. ``node_modules``) are pruned.
+    The files can also be listed from the GIT index (``git ls-files``)
+    instead of walking the folder.
+
+    """
+
+    EXCLUDED_DIRS = [".git", ".hg", "node_modules", "venv-*"]
+
+    def __init__(self, folder=".", ls_files=False):
+        self.folder = folder
+        # the files in each folder (the key is the path from 'folder')
+        self.folders = {}
+        if ls_files:
+            self._ls_files()
+        else:
+            self._walk()
+
+    def _add_folder(self, path):
+        if path not in self.folders:
+            self.folders[path] = []
+            parent = os.path.dirname(path)
+            if path != ".":
+                self._add_folder(parent or ".")
+
+    def _ls_files(self):
+        for file_name in GitBatch(self.folder).ls_files():
+            if self._is_excluded(file_name.split("/")[:-1]):
+                continue
+            path = os.path.dirname(file_name) or "."
+            self._add_folder(path)
+            self.folders[path].append(os.path.basename(file_name))
+
+    def _is_excluded(self, names, excluded_dirs=None):
+        for name in names:
+            for pattern in excluded_dirs or self.EXCLUDED_DIRS:
+                if fnmatch.fnmatch(name, pattern):
+                    return True
+        return False
+
+    def _walk(self):
+        for path, subdirs, files in os.walk(self.folder):
+            subdirs[:] = [x for x in subdirs if not self._is_excluded([x])]
+            self.folders[os.path.relpath(path, self.folder)] = files
+
+    def walk(self, top=".", included_files=None, excluded_dirs=None):
+        """Same as ``filtered_walk`` (from ``walkdir``), but from the index.
+
+        Yields ``(path, files)`` for ``top`` and each folder below it.
+
+        """
+        top = os.path.normpath(top)
+        for path in sorted(self.folders):
+            if top == ".":
+                names = [] if path == "." else path.split(os.sep)
+            elif path == top or path.startswith(top + os.sep):
+                names = path[len(top) :].split(os.sep)[1:]
+            else:
+                continue
+            if excluded_dirs and self._is_excluded(names, excluded_dirs):
+                continue
+            files = self.folders[path]
+            if included_files:
+                files = [
+                    x
+                    for x in files
+                    if any(fnmatch.fnmatch(x, y) for y in included_files)
+                ]
+            yield os.path.join(top, *names), sorted(files)
+
+
+class HashWriter:
+    """Calculate the hashes of an archive as it is written to a file."""
+
+    def __init__(self, f):
+        import hashlib
+
+        self.f = f
+        self.md5 = hashlib.md5()
+        self.sha256 = hashlib.sha256()
+
+    def flush(self):
+        self.f.flush()
+
+    def write(self, data):
+        self.md5.update(data)
+        self.sha256.update(data)
+        return self.f.write(data)
+
+
+class GitBatch:
+    """Read a GIT repository using the plumbing commands.
+
+    Objects are read from one long-lived ``git cat-file --batch`` process
+    and commit metadata from a single ``git log`` stream, so checking an
+    app only starts one or two processes.  The status is saved until the
+    working tree is changed (by ``checkout``, ``pull`` or ``commit``).
+
+    Keyword arguments:
+    fsmonitor -- use the GIT file system monitor and untracked cache for
+                 ``status`` (faster on a large working tree)
+
+    """
+
+    def __init__(self, folder, fsmonitor=False):
+        self.folder = str(folder)
+        self.fsmonitor = fsmonitor
+        self.git_dir = self._get_git_dir()
+        self._cat_file = None
+        self._config = None
+        self._lock = threading.Lock()
+        self._log = {}
+        self._status = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _get_git_dir(self):
+        """The '.git' folder (or the 'gitdir' if '.git' is a file)."""
+        result = pathlib.Path(self.folder, ".git")
+        if result.is_file():
+            with open(result) as f:
+                line = f.read().strip()
+            if not line.startswith("gitdir: "):
+                raise KbError("Not a GIT repository: {}".format(self.folder))
+            result = pathlib.Path(self.folder, line[len("gitdir: ") :])
+        elif not result.is_dir():
+            raise KbError("Not a GIT repository: {}".format(self.folder))
+        return result.resolve()
+
+    def _run(self, *args):
+        result = subprocess.run(
+            ["git", "-C", self.folder] + list(args),
+            capture_output=True,
+            text=True,
+        )
+        if result.returncode:
+            raise KbError(
+                "'git {}' failed in '{}': {}".format(
+                    " ".join(args), self.folder, result.stderr.strip()
+                )
+            )
+        return result.stdout
+
+    def active_branch(self):
+        """Read the branch name from 'HEAD' (without starting a process)."""
+        with open(pathlib.Path(self.git_dir, "HEAD")) as f:
+            head = f.read().strip()
+        if not head.startswith("ref: refs/heads/"):
+            # same exception as GitPython
+            raise TypeError(
+                "HEAD is a detached symbolic reference as it points "
+                "to '{}'".format(head)
+            )
+        return head[len("ref: refs/heads/") :]
+
+    def head(self):
+        """The ``sha`` of 'HEAD' (read from the refs without a process)."""
+        with open(pathlib.Path(self.git_dir, "HEAD")) as f:
+            result = f.read().strip()
+        if result.startswith("ref: "):
+            ref = result[len("ref: ") :]
+            file_name = pathlib.Path(self.git_dir, ref)
+            if file_name.exists():
+                with open(file_name) as f:
+                    result = f.read().strip()
+            else:
+                result = None
+                packed_refs = pathlib.Path(self.git_dir, "packed-refs")
+                if packed_refs.exists():
+                    with open(packed_refs) as f:
+                        for line in f:
+                            if line.rstrip().endswith(" {}".format(ref)):
+                                result = line.split()[0]
+                                break
+        return result
+
+    def cat_file(self, rev):
+        """Returns the ``sha``, ``type`` and content of an object.
+
+        Returns ``None`` if the object does not exist.
+
+        """
+        with self._lock:
+            if not self._cat_file:
+                self._cat_file = subprocess.Popen(
+                    ["git", "-C", self.folder, "cat-file", "--batch"],
+                    stdin=subprocess.PIPE,
+                    stdout=subprocess.PIPE,
+                )
+            self._cat_file.stdin.write("{}\n".format(rev).encode())
+            self._cat_file.stdin.flush()
+            header = self._cat_file.stdout.readline().decode().split()
+            if len(header) != 3:
+                return None
+            sha, object_type, size = header
+            content = self._cat_file.stdout.read(int(size) + 1)[:-1]
+        return sha, object_type, content
+
+    def changed(self):
+        """The working tree has changed, so forget the status and log."""
+        self._log = {}
+        self._status = {}
+
+    def checkout(self, branch):
+        self._run("checkout", branch)
+        self.changed()
+
+    def close(self):
+        if self._cat_file:
+            self._cat_file.stdin.close()
+            self._cat_file.wait()
+            self._cat_file = None
+
+    def commit(self, message, file_names):
+        self._run("add", "--", *file_names)
+        self._run("commit", "-m", message)
+        self.changed()
+
+    def commit_graph_write(self):
+        """Write a commit-graph (with Bloom filters for the changed paths)."""
+        self._run("commit-graph", "write", "--reachable", "--changed-paths")
+
+    def count_objects(self):
+        """The 'git count-objects -v' values e.g. ``count`` (loose objects)."""
+        result = {}
+        for line in self._run("count-objects", "-v").splitlines():
+            key, _, value = line.partition(":")
+            result[key.strip()] = int(value.strip())
+        return result
+
+    def config(self):
+        """The GIT config (``scope``, ``key`` and ``value`` for each item)."""
+        if self._config is None:
+            result = []
+            out = self._run("config", "--list", "--show-scope")
+            for line in out.splitlines():
+                scope, item = line.split("\t", 1)
+                key, _, value = item.partition("=")
+                result.append((scope, key, value))
+            self._config = result
+        return self._config
+
+    def is_ancestor(self, ancestor, rev):
+        result = subprocess.run(
+            ["git", "-C", self.folder, "merge-base", "--is-ancestor"]
+            + [ancestor, rev],
+            capture_output=True,
+        )
+        return result.returncode == 0
+
+    def is_dirty(self):
+        """Same as the GitPython default (untracked files are ignored)."""
+        return bool(self.status(untracked=False))
+
+    def log(self, rev):
+        """Commit metadata from one 'git log' stream (newest first)."""
+        if rev not in self._log:
+            result = []
+            out = self._run("log", "--format=%H%x00%an%x00%s", rev, "--")
+            for line in out.splitlines():
+                sha, author, summary = line.split("\x00", 2)
+                result.append(Commit(sha=sha, author=author, summary=summary))
+            self._log[rev] = result
+        return self._log[rev]
+
+    def ls_files(self):
+        """The files in the GIT index (and untracked files not ignored)."""
+        out = self._run(
+            "ls-files", "-z", "--cached", "--others", "--exclude-standard"
+        )
+        return sorted(set(x for x in out.split("\x00") if x))
+
+    def ls_remote(self, remote):
+        """The head of each branch on the remote."""
+        result = {}
+        for line in self._run("ls-remote", "--heads", remote).splitlines():
+            sha, ref = line.split("\t")
+            result[ref[len("refs/heads/") :]] = sha
+        return result
+
+    def maintenance_register(self):
+        """Add the repository to the GIT background maintenance."""
+        self._run("maintenance", "register")
+
+    def prune(self):
+        """Remove unreachable loose objects."""
+        self._run("prune")
+
+    def pull(self):
+        out = self._run("pull")
+        self.changed()
+        return [x.strip() for x in out.splitlines() if x.strip()]
+
+    def remote_url(self, remote):
+        """Read the URL of the remote from '.git/config'."""
+        import configparser
+
+        config = configparser.ConfigParser(strict=False, interpolation=None)
+        config.read(pathlib.Path(self.git_dir, "config"))
+        return config.get('remote "{}"'.format(remote), "url", fallback=None)
+
+    def repack(self):
+        """Pack the loose objects (and remove the redundant packs)."""
+        self._run("repack", "-d", "-l")
+
+    def rev_parse(self, rev):
+        """The commit ``sha`` for a branch name (or any revision)."""
+        result = self.cat_file("{}^{{commit}}".format(rev))
+        if not result:
+            raise KbError("Cannot find '{}' in '{}'".format(rev, self.folder))
+        return result[0]
+
+    def status(self, untracked=True):
+        """The 'git status --porcelain' lines (saved until a change)."""
+        if untracked not in self._status:
+            options = []
+            if self.fsmonitor:
+                options = [
+                    "-c",
+                    "core.fsmonitor=true",
+                    "-c",
+                    "core.untrackedCache=true",
+                ]
+            out = self._run(
+                *options,
+                "status",
+                "--porcelain",
+                "--untracked-files={}".format("normal" if untracked else "no"),
+            )
+            self._status[untracked] = out.splitlines()
+        return self._status[untracked]
+
+    def tag(self, name):
+        self._run("tag", name)
+
+
+@attr.s
+class GitCheck:
+    """The result of checking the branch (and release) of an app."""
+
+    name = attr.ib()
+    branch = attr.ib()
+    # the version we expect to find (only checked for a project)
+    tag = attr.ib(default=None)
+    # the release commit we found for the version (see '_git_check_tag')
+    found_tag = attr.ib(default=None)
+    found_sha = attr.ib(default=None)
+    # a newer version (if one has been released)
+    latest = attr.ib(default=None)
+    pull = attr.ib(factory=list)
+    # changes which have not been released
+    outstanding = attr.ib(factory=list)
+    error = attr.ib(default=None)
+
+
+@attr.s
+class Maintenance:
+    """The result of the GIT maintenance for an app (see ``maintain``)."""
+
+    name = attr.ib()
+    # time (in seconds) to walk the history of the branch
+    before = attr.ib(default=None)
+    after = attr.ib(default=None)
+    # loose objects
+    loose_before = attr.ib(default=None)
+    loose_after = attr.ib(default=None)
+    error = attr.ib(default=None)
+
+
+@attr.s
+class Package:
+    """The metadata for a release (the same data as ``setup.py``)."""
+
+    # e.g. 'kb-base'
+    name = attr.ib()
+    version = attr.ib()
+    description = attr.ib()
+    author = attr.ib()
+    email = attr.ib()
+    url = attr.ib()
+    packages = attr.ib()
+    package_data = attr.ib()
+    is_project = attr.ib()
+
+    @property
+    def file_name(self):
+        """The name for the sdist and wheel files e.g. ``kb_base-0.2.05``."""
+        return "{}-{}".format(re.sub(r"[-_.]+", "_", self.name), self.version)
+
+
+@attr.s
+class ProjectCheck:
+    """The result of checking a project (or app) in a workspace."""
+
+    folder = attr.ib()
+    is_project = attr.ib()
+    checks = attr.ib(factory=list)
+    error = attr.ib(default=None)
+
+
+@attr.s
+class Provision:
+    """The result of cloning a missing app (see ``provision``)."""
+
+    name = attr.ib()
+    branch = attr.ib()
+    folder = attr.ib()
+    # 'False' if the folder already exists
+    cloned = attr.ib(default=False)
+    # seconds
+    seconds = attr.ib(default=None)
+    error = attr.ib(default=None)
+
+
+@attr.s
+class Unreleased:
+    """The changes on an app branch since the latest release."""
+
+    name = attr.ib()
+    branch = attr.ib()
+    # the latest release on the branch (and the commit)
+    tag = attr.ib(default=None)
+    sha = attr.ib(default=None)
+    count = attr.ib(default=0)
+    # the first line of each commit message (newest first)
+    summaries = attr.ib(factory=list)
+    error = attr.ib(default=None)
 
 
 class KbError(Exception):
@@ -108,12 +608,128 @@ class KbError(Exception):
 
 
 class Release:
+    CLASSIFIERS = [
+        "Development Status :: 1 - Planning",
+        "Environment :: Console",
+        "Intended Audience :: Developers",
+        "License :: OSI Approved :: Apache Software License",
+        "Natural Language :: English",
+        "Operating System :: OS Independent",
+        "Programming Language :: Python",
+        "Programming Language :: Python :: 3",
+        "Framework :: Django :: 1.8",
+        "Topic :: Office/Business :: Scheduling",
+    ]
     TESTING = False
     YAPSY_PLUGIN_EXT = "yapsy-plugin"
 
-    def __init__(self, prefix, pypi):
+    def __init__(
+        self, prefix, pypi, ls_files=False, interactive=True, fsmonitor=False
+    ):
         self.prefix = prefix
         self.pypi = pypi
+        self.ls_files = ls_files
+        # 'False' to release the next version without asking
+        self.interactive = interactive
+        self.fsmonitor = fsmonitor
+        self._file_index = None
+        self._session = None
+
+    def _build(self, package):
+        """Build the sdist and the wheel (in the 'dist' folder)."""
+        rprint("[yellow]build sdist and wheel...")
+        os.makedirs("dist", exist_ok=True)
+        return [self._build_sdist(package), self._build_wheel(package)]
+
+    def _build_sdist(self, package):
+        import tarfile
+
+        file_name = os.path.join("dist", "{}.tar.gz".format(package.file_name))
+        with open(file_name, "wb") as f:
+            writer = HashWriter(f)
+            with tarfile.open(
+                mode="w:gz", fileobj=writer, format=tarfile.PAX_FORMAT
+            ) as tar:
+                data = self._get_metadata(package).encode()
+                tar_info = tarfile.TarInfo(
+                    os.path.join(package.file_name, "PKG-INFO")
+                )
+                tar_info.size = len(data)
+                tar_info.mtime = time.time()
+                tar.addfile(tar_info, io.BytesIO(data))
+                for x in self._get_sdist_files(package):
+                    tar.add(
+                        x,
+                        arcname=os.path.join(package.file_name, x),
+                        recursive=False,
+                    )
+        rprint("[white]  {}".format(file_name))
+        return Archive(
+            file_name=file_name,
+            filetype="sdist",
+            pyversion="source",
+            md5=writer.md5.hexdigest(),
+            sha256=writer.sha256.hexdigest(),
+        )
+
+    def _build_wheel(self, package):
+        import base64
+        import hashlib
+        import zipfile
+
+        dist_info = "{}.dist-info".format(package.file_name)
+        file_name = os.path.join(
+            "dist", "{}-py3-none-any.whl".format(package.file_name)
+        )
+        record = []
+        with open(file_name, "wb") as f:
+            writer = HashWriter(f)
+            with zipfile.ZipFile(writer, "w", zipfile.ZIP_DEFLATED) as wheel:
+
+                def _write(arcname, data):
+                    wheel.writestr(arcname, data)
+                    digest = base64.urlsafe_b64encode(
+                        hashlib.sha256(data).digest()
+                    )
+                    record.append(
+                        "{},sha256={},{}".format(
+                            arcname, digest.rstrip(b"=").decode(), len(data)
+                        )
+                    )
+
+                for x in self._get_package_files(package):
+                    with open(x, "rb") as source:
+                        _write(x.replace(os.sep, "/"), source.read())
+                _write(
+                    "{}/METADATA".format(dist_info),
+                    self._get_metadata(package).encode(),
+                )
+                _write(
+                    "{}/WHEEL".format(dist_info),
+                    b"Wheel-Version: 1.0\n"
+                    b"Generator: kb.py\n"
+                    b"Root-Is-Purelib: true\n"
+                    b"Tag: py3-none-any\n",
+                )
+                top_level = sorted(
+                    set(x.split(".")[0] for x in package.packages)
+                )
+                _write(
+                    "{}/top_level.txt".format(dist_info),
+                    "".join("{}\n".format(x) for x in top_level).encode(),
+                )
+                record.append("{}/RECORD,,".format(dist_info))
+                wheel.writestr(
+                    "{}/RECORD".format(dist_info), "\n".join(record) + "\n"
+                )
+        rprint("[white]  {}".format(file_name))
+        return Archive(
+            file_name=file_name,
+            filetype="bdist_wheel",
+            pyversion="py3",
+            md5=writer.md5.hexdigest(),
+            sha256=writer.sha256.hexdigest(),
+        )
 
     def _check_is_project_or_app(self):
         """An app should have an 'project' folder or an 'example' folder."""
@@ -161,12 +777,23 @@ class Release:
                         "Please check and correct the dependencies and their versions..."
                     )
 
-    def _check_scm_status(self):
+    def _check_scm_status(self, allowed=None):
+        """Check everything has been committed.
+
+        Keyword arguments:
+        allowed -- files we expect to change e.g. the rebuilt SCSS
+
+        """
         rprint("[yellow]check version control status...")
-        scm = Scm(os.getcwd())
+        scm = self._get_session().scm()
         status = scm.get_status()
+        allowed = ["kb.py", "setup.py"] + (allowed or [])
         for name in status:
-            if name not in ("kb.py", "setup.py"):
+            # an untracked folder e.g. 'app/static/css/'
+            is_folder = name.endswith("/") and any(
+                x.startswith(name) for x in allowed
+            )
+            if name not in allowed and not is_folder:
                 msg = (
                     "The following files have not been committed:\n{0}".format(
                         status
@@ -177,22 +804,49 @@ class Release:
 
     def _commit_and_tag(self, version):
         rprint("[yellow]version control - commit and tag...")
-        scm = Scm(os.getcwd())
+        scm = self._get_session().scm()
         scm.commit_and_tag(version)
 
+    def _get_file_index(self):
+        """Find the files once and use them for each step of the release."""
+        if not self._file_index:
+            self._file_index = FileIndex(".", ls_files=self.ls_files)
+        return self._file_index
+
     def _get_description(self):
         rprint("[yellow]get description...")
-        check_setup_yaml_exists()
-        with open(FILENAME_SETUP_YAML) as f:
-            data = yaml.safe_load(f)
+        data = self._get_session().setup_yaml()
         if not "description" in data:
             abort("Package 'description' not found in 'setup.yaml'")
         return data["description"]
 
+    def _get_session(self):
+        """Open the repository (and read 'setup.yaml') once for the release."""
+        if not self._session:
+            self._session = ReleaseSession(os.getcwd(), self.fsmonitor)
+        return self._session
+
+    def _get_metadata(self, package):
+        """The 'PKG-INFO' (sdist) and 'METADATA' (wheel) for the package."""
+        lines = [
+            "Metadata-Version: 2.1",
+            "Name: {}".format(package.name),
+            "Version: {}".format(package.version),
+            "Summary: {}".format(package.description),
+            "Home-page: {}".format(package.url),
+            "Author: {}".format(package.author),
+            "Author-email: {}".format(package.email),
+        ] + ["Classifier: {}".format(x) for x in self.CLASSIFIERS]
+        readme = ""
+        for name in ("README", "README.rst", "README.md"):
+            if os.path.exists(name):
+                with open(name) as f:
+                    readme = f.read()
+                break
+        return "\n".join(lines) + "\n\n" + readme
+
     def _get_name(self):
-        check_setup_yaml_exists()
-        with open(FILENAME_SETUP_YAML) as f:
-            data = yaml.safe_load(f)
+        data = self._get_session().setup_yaml()
         if not "name" in data:
             abort("Package 'name' not found in 'setup.yaml'")
         return data["name"]
@@ -217,22 +871,36 @@ class Release:
     def _get_package_data(self, packages):
         rprint("[yellow]get package data...")
         result = {}
+        file_index = self._get_file_index()
         for package in packages:
-            if os.path.exists(package) and os.path.isdir(package):
-                for folder_name in os.listdir(package):
-                    if folder_name in ("data", "static", "templates"):
-                        folder = os.path.join(package, folder_name)
-                        if os.path.isdir(folder):
-                            walk = filtered_walk(folder)
-                            for path, subdirs, files in walk:
-                                if package not in result:
-                                    result[package] = []
-                                # remove package folder name
-                                result[package].append(
-                                    os.path.join(*path.split(os.sep)[1:])
-                                )
+            for folder_name in ("data", "static", "templates"):
+                folder = os.path.join(package, folder_name)
+                for path, files in file_index.walk(folder):
+                    if package not in result:
+                        result[package] = []
+                    # remove package folder name
+                    result[package].append(
+                        os.path.join(*path.split(os.sep)[1:])
+                    )
         return result
 
+    def _get_package_files(self, package):
+        """The files for the wheel (the packages and their package data)."""
+        file_index = self._get_file_index()
+        result = set()
+        for name in package.packages:
+            folder = name.replace(".", os.sep)
+            for x in file_index.folders.get(folder, []):
+                if x.endswith(".py"):
+                    result.add(os.path.join(folder, x))
+        for name, folders in package.package_data.items():
+            for folder in folders:
+                path = os.path.join(name.replace(".", os.sep), folder)
+                for x in file_index.folders.get(path, []):
+                    if fnmatch.fnmatch(x, "*.*"):
+                        result.add(os.path.join(path, x))
+        return sorted(result)
+
     def _get_packages(self):
         rprint("[yellow]get packages...")
         excluded_dirs = [
@@ -249,11 +917,11 @@ class Release:
         example_folder = _wildcard_folder("example")
         if example_folder:
             excluded_dirs.append(example_folder)
-        walk = filtered_walk(
+        walk = self._get_file_index().walk(
             ".", included_files=["__init__.py"], excluded_dirs=excluded_dirs
         )
         result = []
-        for path, subdirs, files in walk:
+        for path, files in walk:
             if len(files):
                 path = path.replace(os.sep, ".").strip(".")
                 if path:
@@ -269,25 +937,71 @@ class Release:
 
     def _get_scm_config(self):
         rprint("[yellow]get version control config...")
-        scm = Scm(os.getcwd())
+        scm = self._get_session().scm()
         return scm.get_config()
 
+    def _get_sdist_files(self, package):
+        """The files for the sdist (see ``_write_manifest_in``)."""
+        file_index = self._get_file_index()
+        result = set(self._get_package_files(package))
+        folders = ["doc_src", "docs"]
+        for x in package.packages:
+            if not "." in x:
+                folders = folders + [
+                    os.path.join(x, "static"),
+                    os.path.join(x, "templates"),
+                ]
+        for folder in folders:
+            for path, files in file_index.walk(folder):
+                result.update(os.path.join(path, x) for x in files)
+        walk = file_index.walk(
+            ".", included_files=["*.{}".format(self.YAPSY_PLUGIN_EXT)]
+        )
+        for path, files in walk:
+            result.update(
+                os.path.normpath(os.path.join(path, x)) for x in files
+            )
+        patterns = [
+            "LICENSE",
+            "MANIFEST.in",
+            "README*",
+            "requirements/*.txt",
+            "setup.py",
+            "setup.yaml",
+            "*.ttf",
+            "*.txt",
+        ]
+        if package.is_project:
+            patterns.append("manage.py")
+        for pattern in patterns:
+            result.update(x for x in glob.glob(pattern) if os.path.isfile(x))
+        example_folder = _wildcard_folder("example")
+        return sorted(
+            x
+            for x in result
+            if not x.endswith(".pyc")
+            and not (example_folder and x.startswith(example_folder + os.sep))
+        )
+
     def _get_version(self):
-        check_setup_yaml_exists()
-        with open(FILENAME_SETUP_YAML) as f:
-            data = yaml.safe_load(f)
+        from rich.prompt import Prompt
+
+        data = dict(self._get_session().setup_yaml())
         current_version = data["version"]
         next_version = self._get_next_version(current_version)
-        version = input
-        version = Prompt.ask(
-            "Version number to release (previous {})".format(current_version),
-            default=next_version,
-        )
+        if self.interactive:
+            version = Prompt.ask(
+                "Version number to release (previous {})".format(
+                    current_version
+                ),
+                default=next_version,
+            )
+        else:
+            version = next_version
         version = self._validate_version(version)
         data["version"] = version
         if not self.TESTING:
-            with open(FILENAME_SETUP_YAML, "w") as f:
-                yaml.dump(data, f, default_flow_style=False)
+            self._get_session().write_setup_yaml(data)
         rprint("[green]Release version: {0}".format(version))
         return version
 
@@ -296,7 +1010,89 @@ class Release:
             return True
         return False
 
+    def _upload(self, package, archives):
+        """Upload the archives to each package index (at the same time).
+
+        ``self.pypi`` is a comma separated list of the index names in your
+        ``~/.pypirc`` file.
+
+        """
+        from concurrent.futures import ThreadPoolExecutor
+
+        indexes = [x.strip() for x in self.pypi.split(",") if x.strip()]
+        uploads = [(x, y) for x in indexes for y in archives]
+        rprint("[blue]upload to {}...".format(", ".join(indexes)))
+        with ThreadPoolExecutor(max_workers=len(uploads)) as executor:
+            errors = [
+                x
+                for x in executor.map(
+                    lambda x: self._upload_archive(package, *x), uploads
+                )
+                if x
+            ]
+        if errors:
+            for x in errors:
+                rprint("[red]{}".format(x))
+            raise KbError("Failed to upload {} archives".format(len(errors)))
+
+    def _upload_archive(self, package, index, archive):
+        """Upload an archive (using the legacy upload API).
+
+        Returns an error message (or ``None`` if the upload was a success).
+
+        """
+        import requests
+
+        config = pypirc(index)
+        data = {
+            ":action": "file_upload",
+            "protocol_version": "1",
+            "metadata_version": "2.1",
+            "name": package.name,
+            "version": package.version,
+            "summary": package.description,
+            "home_page": package.url,
+            "author": package.author,
+            "author_email": package.email,
+            "filetype": archive.filetype,
+            "pyversion": archive.pyversion,
+            "md5_digest": archive.md5,
+            "sha256_digest": archive.sha256,
+        }
+        base_name = os.path.basename(archive.file_name)
+        result = None
+        for attempt in range(1, UPLOAD_RETRIES + 1):
+            try:
+                with open(archive.file_name, "rb") as f:
+                    response = requests.post(
+                        config["repository"],
+                        auth=(config["username"], config["password"]),
+                        data=data,
+                        files={"content": (base_name, f)},
+                        timeout=UPLOAD_TIMEOUT,
+                    )
+                if response.ok:
+                    rprint(
+                        "[green]'{}' upload to {} - success...".format(
+                            base_name, index
+                        )
+                    )
+                    return None
+                result = "'{}' upload to {} - {} {}".format(
+                    base_name, index, response.status_code, response.reason
+                )
+                # only retry server errors
+                if response.status_code < 500:
+                    break
+            except requests.RequestException as e:
+                result = "'{}' upload to {} - {}".format(base_name, index, e)
+            if attempt < UPLOAD_RETRIES:
+                time.sleep(2**attempt)
+        return result
+
     def _validate_version(self, version):
+        from rich.prompt import Prompt
+
         elem = version.split(".")
         for e in elem:
             if not e.isdigit():
@@ -311,6 +1107,8 @@ class Release:
                     version
                 )
             )
+        if not self.interactive:
+            return version
         confirm = Prompt.ask(
             "Please confirm you want to release version {0} (y/N)".format(
                 version
@@ -356,10 +1154,10 @@ class Release:
             "",
         ]
         # .yapsy-plugin
-        walk = filtered_walk(
+        walk = self._get_file_index().walk(
             ".", included_files=["*.{}".format(self.YAPSY_PLUGIN_EXT)]
         )
-        for path, subdirs, files in walk:
+        for path, files in walk:
             if files:
                 content = content + [
                     "include {}/*.{}".format(path[2:], self.YAPSY_PLUGIN_EXT)
@@ -370,6 +1168,7 @@ class Release:
             content = content + ["prune {}/".format(example_folder)]
         with open("MANIFEST.in", "w") as f:
             f.write("\n".join(content))
+        self._get_session().changed()
 
     def _write_setup(
         self,
@@ -416,17 +1215,7 @@ setup(
     author_email='%s',
     url='%s',
     classifiers=[
-        'Development Status :: 1 - Planning',
-        'Environment :: Console',
-        'Intended Audience :: Developers',
-        'License :: OSI Approved :: Apache Software License',
-        'Natural Language :: English',
-        'Operating System :: OS Independent',
-        'Programming Language :: Python',
-        'Programming Language :: Python :: 3',
-        'Framework :: Django :: 1.8',
-        'Topic :: Office/Business :: Scheduling',
-    ],
+%s    ],
     long_description=get_readme(),
 )"""
         packages_delim = []
@@ -457,8 +1246,13 @@ setup(
                     author,
                     email,
                     url,
+                    "".join(
+                        "{}'{}',\n".format(" " * 8, x)
+                        for x in self.CLASSIFIERS
+                    ),
                 )
             )
+        self._get_session().changed()
 
     def release(self):
         if not self.prefix:
@@ -466,9 +1260,17 @@ setup(
             rprint("[red]{}".format(msg))
             raise KbError(msg)
         self._check_is_project_or_app()
+        # the status is saved, so it is re-used by '_check_scm_status'
+        session = self._get_session()
+        front_end_files = check_front_end(
+            self.interactive,
+            uncommitted=None if self.TESTING else session.scm().get_status(),
+        )
+        if front_end_files:
+            session.changed()
         url, user, email = self._get_scm_config()
         if not self.TESTING:
-            self._check_scm_status()
+            self._check_scm_status(front_end_files)
         description = self._get_description()
         packages = self._get_packages()
         package_data = self._get_package_data(packages)
@@ -490,39 +1292,69 @@ setup(
         )
         if not self.TESTING:
             self._commit_and_tag(version)
-            # command = "python setup.py clean sdist upload -r {}".format(
-            #    self.pypi
-            # )
-            rprint("[blue]clean sdist upload...")
-            command = [
-                "python",
-                "setup.py",
-                "clean",
-                "sdist",
-                "upload",
-                "-r",
-                self.pypi,
-            ]
-            try:
-                result = subprocess.run(command, capture_output=True, text=True)
-                if result.returncode == 0:
-                    rprint(
-                        "[green]'setup.py', 'upload' to {} - success...".format(
-                            self.pypi
-                        )
-                    )
-                else:
-                    rprint("[red]{}".format(command))
-                    for x in result.stderr.split("\n"):
-                        rprint("[red]{}".format(x))
-                    raise KbError("Failed to run the 'sdist upload' process")
-            except Exception as e:
-                raise KbError("Failed to run the 'sdist upload' process", e)
+            package = Package(
+                name="{}-{}".format(self.prefix, safe_name(name)),
+                version=version,
+                description=description,
+                author=user,
+                email=email,
+                url=url,
+                packages=packages,
+                package_data=package_data,
+                is_project=is_project,
+            )
+            self._upload(package, self._build(package))
+        return version
+
+
+class ReleaseSession:
+    """The folder we are releasing (shared by each step of the release).
+
+    The repository is opened once and the status (and config) are saved
+    until a file is written (see ``changed``).  ``setup.yaml`` is only parsed
+    once.
+
+    """
+
+    def __init__(self, folder, fsmonitor=False):
+        self.folder = folder
+        self.fsmonitor = fsmonitor
+        self._scm = None
+        self._setup_yaml = None
+
+    def changed(self):
+        """A file has been written, so forget the status."""
+        if self._scm:
+            self._scm.changed()
+
+    def scm(self):
+        if not self._scm:
+            self._scm = Scm(self.folder, self.fsmonitor)
+        return self._scm
+
+    def setup_yaml(self):
+        import yaml
+
+        if self._setup_yaml is None:
+            check_setup_yaml_exists()
+            with open(os.path.join(self.folder, FILENAME_SETUP_YAML)) as f:
+                self._setup_yaml = yaml.safe_load(f)
+        return self._setup_yaml
+
+    def write_setup_yaml(self, data):
+        import yaml
+
+        with open(os.path.join(self.folder, FILENAME_SETUP_YAML), "w") as f:
+            yaml.dump(data, f, default_flow_style=False)
+        self._setup_yaml = data
+        self.changed()
 
 
 class Scm:
-    def __init__(self, folder):
+    def __init__(self, folder, fsmonitor=False):
         self.folder = folder
+        self.fsmonitor = fsmonitor
+        self._git_repo = None
         self._is_hg = self.is_mercurial()
         if not self._is_hg:
             if not self.is_git():
@@ -537,13 +1369,19 @@ class Scm:
         pass
 
     def _get_git_repo(self):
-        return Repo(self.folder)
+        if not self._git_repo:
+            self._git_repo = GitBatch(self.folder, self.fsmonitor)
+        return self._git_repo
+
+    def changed(self):
+        if not self._is_hg:
+            self._get_git_repo().changed()
 
     def is_git(self):
         try:
             self._get_git_repo()
             return True
-        except InvalidGitRepositoryError:
+        except KbError:
             return False
 
     def is_mercurial(self):
@@ -579,17 +1417,22 @@ class Scm:
                     "Cannot find bitbucket path to repository: {0}".format(path)
                 )
         else:
-            repo = self._get_git_repo()
-            if len(repo.remotes) == 1:
-                remote = repo.remotes[0]
-                path = remote.url
-                name = repo.config_reader(config_level="global").get(
-                    "user", "name"
-                )
-                email = repo.config_reader(config_level="global").get(
-                    "user", "email"
-                )
-                result = path, name, email
+            config = self._get_git_repo().config()
+            remotes = [
+                value
+                for scope, key, value in config
+                if scope == "local"
+                and key.startswith("remote.")
+                and key.endswith(".url")
+            ]
+            if len(remotes) == 1:
+                path = remotes[0]
+                user = {
+                    key: value
+                    for scope, key, value in config
+                    if scope == "global" and key.startswith("user.")
+                }
+                result = path, user.get("user.name"), user.get("user.email")
             else:
                 raise KbError(
                     "GIT repo has more than one remote.  Don't know what to do!"
@@ -605,8 +1448,7 @@ class Scm:
                     result.append(name)
         else:
             repo = self._get_git_repo()
-            out = repo.git.status("--porcelain")
-            for line in out.splitlines():
+            for line in repo.status():
                 name = line.strip()
                 pos = name.find(" ")
                 if pos == -1:
@@ -628,7 +1470,7 @@ class Scm:
                         name
                     )
                 )
-        if len(self.get_status()):
+        if len(status):
             message = "version {0}".format(version)
             tag = "{0}".format(version)
             if self._is_hg:
@@ -637,77 +1479,354 @@ class Scm:
                 repo.hg_tag(tag)
             else:
                 repo = self._get_git_repo()
-                index = repo.index
-                index.add(status)
-                index.commit(message)
-                repo.create_tag(tag)
+                repo.commit(message, status)
+                repo.tag(tag)
 
 
-def _wildcard_folder(prefix):
-    """
-    Search the current folder for a directory where the name starts with
-    'prefix'.  Check there is just one folder starting with that name and
-    return the actual name without the path e.g::
+class Watcher:
+    """Wait for files to change (in a list of folders).
+
+    Uses ``inotify`` (Linux) and polls the folders if it is not available.
+    Each folder has a ``key`` (e.g. the app name) and ``wait`` returns the
+    keys for the folders which changed.
 
-    folder = _wildcard_folder('example')
-    if folder:
-        print(folder)
-        # 'example-block'
     """
-    result = None
-    folder = os.path.join(os.getcwd(), prefix)
-    match = glob.glob("{}*".format(folder))
-    match_count = len(match)
-    if match_count == 1:
-        found = match[0]
-        if os.path.isdir(found):
-            result = os.path.basename(found)
-    elif match_count > 1:
-        abort("Found more than one folder starting with: '{}'".format(prefix))
-    return result
 
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_DELETE = 0x00000200
+    IN_ISDIR = 0x40000000
+    MASK = IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_DELETE
+    # seconds
+    POLL_INTERVAL = 1.0
+    SETTLE = 0.2
+
+    def __init__(self):
+        # 'folder': (key, patterns)
+        self.folders = {}
+        self._fd = None
+        self._libc = None
+        self._snapshot = {}
+        self._wd = {}
+        try:
+            import ctypes
+            import ctypes.util
 
-def app_name(name):
-    return name.replace("-", "_")
+            self._libc = ctypes.CDLL(
+                ctypes.util.find_library("c"), use_errno=True
+            )
+            fd = self._libc.inotify_init1(os.O_CLOEXEC)
+            if fd >= 0:
+                self._fd = fd
+        except (AttributeError, OSError):
+            pass
 
+    def __enter__(self):
+        return self
 
-def app_to_folder(name):
-    return name.replace("_", "-")
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
 
+    def _is_watched(self, folder, name):
+        key, patterns = self.folders[folder]
+        # GIT writes to a '.lock' file and then renames it
+        if name.endswith(".lock"):
+            return False
+        if patterns and not any(fnmatch.fnmatch(name, x) for x in patterns):
+            return False
+        return True
 
-def apps_equal(x_apps, y_apps, x_caption, y_caption):
-    result_a = set([x.name for x in x_apps]) - set([y.name for y in y_apps])
-    result_b = set([y.name for y in y_apps]) - set([x.name for x in x_apps])
-    if result_a or result_b:
-        rprint("[red]{}".format([x.name for x in x_apps]))
-        rprint("[pink]{}".format([y.name for y in y_apps]))
-        raise KbError(
-            "'{}' has different apps to '{}': {}".format(
-                x_caption, y_caption, result_a or result_b
+    def _poll(self, folders):
+        """The modified time and size of the files in each folder."""
+        result = {}
+        for folder in folders:
+            try:
+                for entry in os.scandir(folder):
+                    if entry.is_file():
+                        stat = entry.stat()
+                        result[(folder, entry.name)] = (
+                            stat.st_mtime_ns,
+                            stat.st_size,
+                        )
+            except FileNotFoundError:
+                pass
+        return result
+
+    def _read(self, timeout):
+        """Read the ``inotify`` events.
+
+        Returns a set of keys (empty if nothing changed in ``timeout``).
+
+        """
+        import select
+        import struct
+
+        result = set()
+        if not select.select([self._fd], [], [], timeout)[0]:
+            return result
+        data = os.read(self._fd, 64 * 1024)
+        pos = 0
+        while pos < len(data):
+            wd, mask, cookie, length = struct.unpack_from("iIII", data, pos)
+            name = data[pos + 16 : pos + 16 + length].rstrip(b"\0").decode()
+            pos = pos + 16 + length
+            folder = self._wd.get(wd)
+            if not folder:
+                continue
+            if mask & self.IN_ISDIR:
+                # a new folder e.g. 'refs/heads/feature/'
+                if mask & self.IN_CREATE:
+                    key, patterns = self.folders[folder]
+                    self.add(os.path.join(folder, name), key, patterns)
+            elif self._is_watched(folder, name):
+                result.add(self.folders[folder][0])
+        return result
+
+    def add(self, folder, key, patterns=None):
+        """Watch the files in ``folder`` (matching ``patterns``)."""
+        folder = os.path.abspath(folder)
+        if not os.path.isdir(folder) or folder in self.folders:
+            return
+        self.folders[folder] = (key, patterns)
+        if self._fd is None:
+            self._snapshot.update(self._poll([folder]))
+        else:
+            wd = self._libc.inotify_add_watch(
+                self._fd, folder.encode(), self.MASK
             )
-        )
-    else:
-        logger.info(
-            "'{}' has the same apps as '{}'".format(x_caption, y_caption)
-        )
+            if wd >= 0:
+                self._wd[wd] = folder
 
+    def clear(self):
+        """Stop watching all of the folders."""
+        for wd in self._wd:
+            self._libc.inotify_rm_watch(self._fd, wd)
+        self.folders = {}
+        self._snapshot = {}
+        self._wd = {}
 
-def branch_is_equal(app, repo, checkout):
-    result = False
-    try:
-        if app.branch == repo.active_branch.name:
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    def wait(self):
+        """Wait until a file changes.
+
+        A change (e.g. ``git checkout``) will often write several files, so
+        we wait for the changes to settle before returning.
+
+        Returns the keys for the folders which changed.
+
+        """
+        result = set()
+        if self._fd is None:
+            while not result:
+                time.sleep(self.POLL_INTERVAL)
+                snapshot = self._poll(self.folders)
+                for folder, name in set(snapshot) | set(self._snapshot):
+                    before = self._snapshot.get((folder, name))
+                    if snapshot.get((folder, name)) == before:
+                        continue
+                    if self._is_watched(folder, name):
+                        result.add(self.folders[folder][0])
+                self._snapshot = snapshot
+        else:
+            while not result:
+                result = self._read(None)
+            while True:
+                keys = self._read(self.SETTLE)
+                if not keys:
+                    break
+                result.update(keys)
+        return result
+
+
+class Workspace:
+    """The folder containing our projects and apps e.g. ``~/dev/``::
+
+      ~/dev/app/base/
+      ~/dev/project/hatherleigh/
+
+    The repository for each app is opened once and shared by the projects,
+    so the state of an app (e.g. the status and log) is only read once.
+
+    """
+
+    def __init__(self, folder=None):
+        if folder is None:
+            # 'kb.py' is in '~/dev/module/toolbox/'
+            folder = os.path.join(
+                os.path.dirname(os.path.realpath(__file__)), "..", ".."
+            )
+        self.folder = os.path.abspath(folder)
+        self._lock = threading.Lock()
+        self._repos = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def app_folder(self, app):
+        return os.path.join(self.folder, "app", app_to_folder(app.name))
+
+    def close(self):
+        with self._lock:
+            for repo in self._repos.values():
+                repo.close()
+            self._repos = {}
+
+    def projects(self):
+        """The projects (and apps) which have a 'requirements' folder.
+
+        Returns a list of ``(folder, is_project)``.
+
+        """
+        result = []
+        for name in ("project", "app"):
+            for folder in sorted(
+                glob.glob(os.path.join(self.folder, name, "*", "requirements"))
+            ):
+                result.append((os.path.dirname(folder), name == "project"))
+        return result
+
+    def repo(self, app):
+        """The (shared) repository for an app."""
+        folder = self.app_folder(app)
+        with self._lock:
+            if folder not in self._repos:
+                if not os.path.exists(folder):
+                    raise KbError(
+                        "App folder does not exist: {}".format(folder)
+                    )
+                self._repos[folder] = GitBatch(folder)
+            return self._repos[folder]
+
+
+def _git_check_tag(app, repo, tag_to_find, result):
+    """Find the release commit for ``tag_to_find`` on the app branch."""
+    result.tag = str(tag_to_find)
+    releases = release_index(repo, app.branch)
+    found = None
+    for sha, tag in releases:
+        if tag_to_semver(tag) == tag_to_find:
+            found = sha
+            result.found_tag = str(tag_to_semver(tag))
+            result.found_sha = sha
+            break
+    if not found:
+        raise KbError(
+            "Cannot find tag '{}' on the '{}' branch of "
+            "'{}'{}".format(
+                tag_to_find,
+                app.branch,
+                app_to_folder(app.name),
+                " (but found {})".format(tag_to_semver(releases[0][1]))
+                if releases
+                else "",
+            )
+        )
+    latest = tag_to_semver(releases[0][1])
+    if latest > tag_to_find:
+        result.latest = str(latest)
+    if found != repo.rev_parse(app.branch):
+        result.outstanding = [
+            "{} ({})".format(commit.summary.strip(), commit.author)
+            for commit in repo.log("{}..{}".format(found, app.branch))
+        ]
+
+
+def _release_app(folder, prefix, pypi, ls_files, fsmonitor):
+    """Release an app without asking any questions (see ``release_apps``).
+
+    This runs in a separate process, because ``Release`` uses the current
+    folder.
+
+    Returns ``(version, output, error)``.
+
+    """
+    version = error = None
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        try:
+            os.chdir(folder)
+            version = Release(
+                prefix, pypi, ls_files, interactive=False, fsmonitor=fsmonitor
+            ).release()
+        except Exception as e:
+            error = e.value if isinstance(e, KbError) else str(e)
+    return version, output.getvalue(), error
+
+
+def _wildcard_folder(prefix):
+    """
+    Search the current folder for a directory where the name starts with
+    'prefix'.  Check there is just one folder starting with that name and
+    return the actual name without the path e.g::
+
+    folder = _wildcard_folder('example')
+    if folder:
+        print(folder)
+        # 'example-block'
+    """
+    result = None
+    folder = os.path.join(os.getcwd(), prefix)
+    match = glob.glob("{}*".format(folder))
+    match_count = len(match)
+    if match_count == 1:
+        found = match[0]
+        if os.path.isdir(found):
+            result = os.path.basename(found)
+    elif match_count > 1:
+        abort("Found more than one folder starting with: '{}'".format(prefix))
+    return result
+
+
+def app_name(name):
+    return name.replace("-", "_")
+
+
+def app_to_folder(name):
+    return name.replace("_", "-")
+
+
+def apps_equal(x_apps, y_apps, x_caption, y_caption, display=True):
+    result_a = set([x.name for x in x_apps]) - set([y.name for y in y_apps])
+    result_b = set([y.name for y in y_apps]) - set([x.name for x in x_apps])
+    if result_a or result_b:
+        if display:
+            rprint("[red]{}".format([x.name for x in x_apps]))
+            rprint("[pink]{}".format([y.name for y in y_apps]))
+        raise KbError(
+            "'{}' has different apps to '{}': {}".format(
+                x_caption, y_caption, result_a or result_b
+            )
+        )
+    else:
+        logger.info(
+            "'{}' has the same apps as '{}'".format(x_caption, y_caption)
+        )
+
+
+def branch_is_equal(app, repo, checkout):
+    result = False
+    try:
+        if app.branch == repo.active_branch():
             result = True
         elif checkout:
             logger.info("'{}' checkout '{}'".format(app.name, app.branch))
             if repo.is_dirty():
                 raise KbError(
                     "'{}', branch {} has changes ('is_dirty')".format(
-                        app.name, repo.active_branch.name
+                        app.name, repo.active_branch()
                     )
                 )
             else:
-                repo.git.checkout(app.branch)
-            result = app.branch == repo.active_branch.name
+                repo.checkout(app.branch)
+            result = app.branch == repo.active_branch()
     except TypeError as e:
         raise KbError(
             "app '{}', branch '{}': {}".format(app.name, app.branch, str(e))
@@ -715,7 +1834,7 @@ def branch_is_equal(app, repo, checkout):
     return result
 
 
-def branches_equal(x_apps, y_apps, x_caption, y_caption):
+def branches_equal(x_apps, y_apps, x_caption, y_caption, display=True):
     x_data = set(["{}@{}".format(x.name, x.branch) for x in x_apps])
     y_data = set(["{}@{}".format(y.name, y.branch) for y in y_apps])
     result_a = x_data - y_data
@@ -732,10 +1851,12 @@ def branches_equal(x_apps, y_apps, x_caption, y_caption):
         )
 
 
-def branch(requirements_file_name, allow_missing_file=None):
+def branch(requirements_file_name, allow_missing_file=None, folder=None):
     result = []
     try:
-        file_name = os.path.join("requirements", requirements_file_name)
+        file_name = os.path.join(
+            folder or "", "requirements", requirements_file_name
+        )
         with open(file_name) as f:
             for line in f:
                 # handle empty 'branch.txt' file
@@ -757,8 +1878,287 @@ def branch(requirements_file_name, allow_missing_file=None):
     return result
 
 
+def check(is_project, checkout, pull, jobs=1, pull_jobs=None):
+    """Check the requirements and the branch (and tag) of each app.
+
+    Returns a list of ``GitCheck`` (for the apps and the ember apps).
+
+    """
+    ci_apps, production_apps = check_requirements(is_project)
+    result = git(
+        ci_apps,
+        production_apps,
+        is_project,
+        checkout,
+        pull,
+        jobs,
+        pull_jobs,
+    )
+    # ember
+    ember_apps = branch("ember.txt", allow_missing_file=True)
+    if ember_apps:
+        result = result + check_ember_branches(
+            ember_apps, checkout, pull, jobs, pull_jobs
+        )
+    return result
+
+
+def check_cache_file_name():
+    """The cache for the current folder (see 'check_fingerprint')."""
+    import hashlib
+
+    folder = hashlib.sha256(os.getcwd().encode()).hexdigest()[:16]
+    return CACHE_FOLDER.joinpath("check-{}.json".format(folder))
+
+
+def check_fingerprint(is_project, jobs=1):
+    """A fingerprint of everything used by ``check``.
+
+    This includes the contents of the requirements files (and ``kb.py``)
+    and the head, branch and 'is_dirty' state of each app.
+
+    """
+    import hashlib
+    from concurrent.futures import ThreadPoolExecutor
+
+    fingerprint = hashlib.sha256()
+    fingerprint.update(str(is_project).encode())
+    file_names = [os.path.realpath(__file__)] + sorted(
+        glob.glob(os.path.join("requirements", "*.txt"))
+    )
+    for file_name in file_names:
+        with open(file_name, "rb") as f:
+            fingerprint.update(file_name.encode() + b"\x00" + f.read())
+    apps = ci()
+    if os.path.exists(os.path.join("requirements", "ember.txt")):
+        apps = apps + branch("ember.txt")
+
+    def _state(app):
+        with git_repo(app) as repo:
+            return "{}|{}|{}|{}".format(
+                app.name, repo.active_branch(), repo.head(), repo.is_dirty()
+            )
+
+    with ThreadPoolExecutor(max_workers=max(jobs, PULL_JOBS)) as executor:
+        for state in executor.map(_state, apps):
+            fingerprint.update(state.encode())
+    return fingerprint.hexdigest()
+
+
+def check_front_end(interactive=True, folder=".", uncommitted=None):
+    """Rebuild the SCSS if the sources (or the output) have changed.
+
+    The content hash of each source and output file is saved in
+    ``kb-front-end.json`` after the build.  If the hashes are the same, the
+    SCSS does not need to be rebuilt.  The build uses the first of the
+    ``FRONT_END_SCRIPTS`` in ``package.json`` e.g. ``npm run build-css``.
+
+    Returns the files changed by the build (an empty list if nothing was
+    rebuilt).
+
+    Keyword arguments:
+    uncommitted -- the files which have not been committed.  If
+                   ``kb-front-end.json`` has not been committed (a release
+                   stopped after the build), the output files are returned
+                   (so they can be committed by this release)
+
+    """
+    if not os.path.exists(os.path.join(folder, "package.json")):
+        return []
+    rprint("[yellow]check front-end (SCSS)...")
+    sources, outputs = front_end_hashes(folder)
+    file_name = os.path.join(folder, FILENAME_FRONT_END)
+    manifest = {}
+    if os.path.exists(file_name):
+        with open(file_name) as f:
+            manifest = json.load(f)
+    if (
+        manifest.get("sources") == sources
+        and manifest.get("outputs") == outputs
+    ):
+        if FILENAME_FRONT_END in (uncommitted or []):
+            rprint("[yellow]The SCSS is up to date (but not committed)")
+            return sorted(outputs) + [FILENAME_FRONT_END]
+        rprint("[green]The SCSS is up to date (nothing has changed)")
+        return []
+    script = front_end_script(folder)
+    if script:
+        rprint("[yellow]npm run {}...".format(script))
+        result = subprocess.run(
+            ["npm", "run", script], cwd=folder, capture_output=True, text=True
+        )
+        if result.returncode:
+            for x in result.stderr.splitlines():
+                rprint("[red]{}".format(x))
+            raise KbError(
+                "Failed to rebuild the SCSS ('npm run {}')".format(script)
+            )
+    elif interactive:
+        _file_exists_in_current_folder(os.path.join(folder, "package.json"))
+    else:
+        raise KbError(
+            "Cannot find a script to rebuild the SCSS in 'package.json' "
+            "(tried {})".format(", ".join(FRONT_END_SCRIPTS))
+        )
+    sources, rebuilt = front_end_hashes(folder)
+    with open(file_name, "w") as f:
+        json.dump(
+            dict(script=script, sources=sources, outputs=rebuilt),
+            f,
+            indent=2,
+            sort_keys=True,
+        )
+        f.write("\n")
+    return sorted(x for x in rebuilt if outputs.get(x) != rebuilt[x]) + [
+        FILENAME_FRONT_END
+    ]
+
+
+def check_project(folder, is_project, workspace):
+    """Check a project (or app) in a workspace (without displaying it).
+
+    Returns a ``ProjectCheck``.
+
+    """
+    result = ProjectCheck(folder=folder, is_project=is_project)
+    try:
+        ci_apps, production_apps = check_requirements(
+            is_project, folder, display=False
+        )
+        apps = [(ci_apps, production_apps, is_project)]
+        if os.path.exists(os.path.join(folder, "requirements", "ember.txt")):
+            apps.append((branch("ember.txt", folder=folder), [], False))
+        for apps_with_branch, apps_with_tag, check_tags in apps:
+            result.checks = result.checks + git_checks(
+                apps_with_branch,
+                apps_with_tag,
+                check_tags,
+                checkout=False,
+                pull=False,
+                jobs=1,
+                workspace=workspace,
+            )
+    except (KbError, OSError, ValueError) as e:
+        result.error = e.value if isinstance(e, KbError) else str(e)
+    return result
+
+
+def check_requirements(is_project, folder=None, display=True):
+    """Check the apps (and branches) are the same in each requirements file.
+
+    Returns the apps in ``ci.txt`` and ``production.txt``.
+
+    Keyword arguments:
+    display -- display the apps which are different (``False`` for the
+               workspace threads, the error is in the ``KbError``)
+
+    """
+    ci_apps, production_apps, comparisons = requirements_comparisons(
+        is_project, folder
+    )
+    for compare, x_apps, y_apps, x_caption, y_caption in comparisons:
+        compare(x_apps, y_apps, x_caption, y_caption, display=display)
+    return ci_apps, production_apps
+
+
+def check_report(is_project, jobs=1, folder=None, workspace=None):
+    """Check a project (or app) and return the result as a ``dict``.
+
+    Nothing is displayed and the errors are not raised, so the result can
+    be saved as JSON (see ``--format json``).
+
+    """
+    result = dict(
+        folder=os.path.abspath(folder or os.getcwd()),
+        is_project=is_project,
+        requirements=[],
+        apps=[],
+        error=None,
+    )
+    try:
+        ci_apps, production_apps, comparisons = requirements_comparisons(
+            is_project, folder
+        )
+        for compare, x_apps, y_apps, x_caption, y_caption in comparisons:
+            error = None
+            try:
+                compare(x_apps, y_apps, x_caption, y_caption, display=False)
+            except KbError as e:
+                error = e.value
+            result["requirements"].append(
+                dict(
+                    check=compare.__name__,
+                    files=[x_caption, y_caption],
+                    error=error,
+                )
+            )
+        apps = [(ci_apps, production_apps, is_project)]
+        ember = os.path.join(folder or "", "requirements", "ember.txt")
+        if os.path.exists(ember):
+            apps.append((branch("ember.txt", folder=folder), [], False))
+        with contextlib.ExitStack() as stack:
+            if workspace is None:
+                workspace = stack.enter_context(Workspace())
+            for apps_with_branch, apps_with_tag, check_tags in apps:
+                checks = git_checks(
+                    apps_with_branch,
+                    apps_with_tag,
+                    check_tags,
+                    checkout=False,
+                    pull=False,
+                    jobs=jobs,
+                    workspace=workspace,
+                )
+                releases = unreleased(apps_with_branch, jobs, workspace)
+                for check, release in zip(checks, releases):
+                    count = None if release.error else release.count
+                    result["apps"].append(
+                        dict(
+                            name=check.name,
+                            branch=check.branch,
+                            expected_tag=check.tag,
+                            found_tag=check.found_tag,
+                            found_sha=check.found_sha,
+                            latest=check.latest,
+                            outstanding=len(check.outstanding),
+                            unreleased=count,
+                            warnings=git_check_warnings(check),
+                            error=check.error,
+                        )
+                    )
+    except (KbError, OSError, ValueError) as e:
+        result["error"] = e.value if isinstance(e, KbError) else str(e)
+    result["ok"] = not (
+        result["error"]
+        or any(x["error"] for x in result["requirements"])
+        or any(x["error"] for x in result["apps"])
+    )
+    return result
+
+
+def check_workspace(workspace, jobs=1):
+    """Check every project (and app) in the workspace.
+
+    The projects are checked in a pool of ``jobs`` threads.
+
+    Returns a list of ``ProjectCheck`` (sorted by folder).
+
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    projects = workspace.projects()
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        return list(
+            executor.map(
+                lambda x: check_project(x[0], x[1], workspace), projects
+            )
+        )
+
+
 def check_setup_yaml_exists():
     """The file, 'setup.yaml' looks like the 'sample_data' below:"""
+    import yaml
+
     if not os.path.exists(FILENAME_SETUP_YAML):
         sample_data = {
             "description": "User Auth",
@@ -772,7 +2172,7 @@ def check_setup_yaml_exists():
         raise KbError(msg)
 
 
-def ci():
+def ci(folder=None):
     """Parse the CI requirements.
 
     Example::
@@ -782,16 +2182,21 @@ def ci():
       -e git+https://gitlab.com/kb/base.git#egg=base
       pytest-django
 
+    A ``file:`` URL can be used for a local repository
+    e.g. ``-e git+file:///srv/git/kb/base.git#egg=base``.
+
     """
     result = []
-    with open(os.path.join("requirements", "ci.txt")) as f:
+    with open(os.path.join(folder or "", "requirements", "ci.txt")) as f:
         for line in f:
             branch = None
             pos = line.find("http")
+            if pos == -1:
+                pos = line.find("file:")
             if pos == -1:
                 pass
             else:
-                url = line[pos:]
+                url = line[pos:].strip()
                 p = urlparse(url)
                 # option to use the egg instead?
                 # egg = p.fragment
@@ -808,17 +2213,66 @@ def ci():
                 pos_sla = p.path.rfind("/")
                 pos_dot = p.path.rfind(".")
                 name = p.path[pos_sla + 1 : pos_dot]
+                # the URL without the branch name (or egg)
+                path = p.path if pos == -1 else p.path[:pos]
                 result.append(
                     App(
                         name=app_name(name),
                         branch=branch,
                         tag=None,
                         semantic_version=None,
+                        url=urlunparse((p.scheme, p.netloc, path, "", "", "")),
                     )
                 )
     return result
 
 
+def front_end_hashes(folder="."):
+    """The content hash of the front-end sources and the built output.
+
+    Returns ``(sources, outputs)`` (the file name and hash of each file).
+
+    """
+    import hashlib
+
+    result = []
+    file_index = FileIndex(folder)
+    for patterns in (FRONT_END_SOURCES, FRONT_END_OUTPUTS):
+        hashes = {}
+        for path, files in file_index.walk(".", included_files=patterns):
+            for x in files:
+                file_name = os.path.normpath(os.path.join(path, x))
+                with open(os.path.join(folder, file_name), "rb") as f:
+                    hashes[file_name] = hashlib.sha256(f.read()).hexdigest()
+        result.append(hashes)
+    return tuple(result)
+
+
+def front_end_script(folder="."):
+    """The 'package.json' script to rebuild the SCSS (or ``None``)."""
+    with open(os.path.join(folder, "package.json")) as f:
+        scripts = json.load(f).get("scripts", {})
+    for name in FRONT_END_SCRIPTS:
+        if name in scripts:
+            return name
+    return None
+
+
+def front_end_version(argv):
+    """Run ``--version-config`` or ``--version-txt`` (and exit).
+
+    These are run by the front-end build scripts (many times a day), so they
+    are checked before the argument parser is created.
+
+    """
+    if "--version-config" in argv:
+        update_config_environment()
+        exit("Complete...")
+    if "--version-txt" in argv:
+        create_dist_version_txt()
+        exit("Complete...")
+
+
 def get_is_project():
     is_app = is_project = False
     current_folder = os.getcwd()
@@ -835,118 +2289,401 @@ def get_is_project():
     return is_project
 
 
-def git(apps_with_branch, apps_with_tag, is_project, checkout, pull):
-    """Check each app is on the expected branch."""
-    tags = {x.name: x.semantic_version for x in apps_with_tag}
-    for app in apps_with_branch:
-        repo = git_repo(app)
-        if branch_is_equal(app, repo, checkout):
-            if pull:
-                print("pulling from {}".format(app.name))
-                fetch_info = repo.remotes.origin.pull()
-                for x in fetch_info:
-                    if x.note:
-                        print("  {}".format(x.note))
-            # only check tags if this is a project
-            if is_project:
-                first = None
-                first_tag = None
-                found = False
-                outstanding = []
-                tag_to_find = tags[app.name]
-                # PJK 06/05/2019, For some reason tags are not appearing.
-                # We should check the fabric scripts to find out why.
-                # for tag in repo.tags:
-                #    if tag.commit in commits and tag.name == tag_to_find:
-                #        found = True
-                #        break
-                # check commit messages to try and find the version number
-                commits = list(
-                    repo.iter_commits(app.branch, max_count=GIT_COMMIT_COUNT)
+def display_git_checks(checks):
+    for check in checks:
+        if check.pull:
+            print("pulling from {}".format(check.name))
+            for note in check.pull:
+                print("  {}".format(note))
+        for warning in git_check_warnings(check):
+            print("* Warning: {}".format(warning))
+        if check.outstanding:
+            for count, x in enumerate(check.outstanding, 1):
+                print("  {}. {}".format(count, x))
+        if check.error:
+            rprint("[red]{}".format(check.error))
+    errors = [x for x in checks if x.error]
+    if errors:
+        print()
+        rprint("[red]{} of {} apps failed...".format(len(errors), len(checks)))
+        for check in errors:
+            rprint("[red]  {:<30} {}".format(check.name, check.error))
+
+
+def display_workspace(workspace, projects):
+    print()
+    rprint("[yellow]Workspace: {}".format(workspace.folder))
+    rprint(
+        "[white]{:<40} {:>6} {:>10} {:>8}  {}".format(
+            "folder", "apps", "unreleased", "newer", "status"
+        )
+    )
+    for project in projects:
+        errors = [x for x in project.checks if x.error]
+        ok = not (project.error or errors)
+        rprint(
+            "[{}]{:<40} {:>6} {:>10} {:>8}  {}".format(
+                "green" if ok else "red",
+                os.path.relpath(project.folder, workspace.folder),
+                len(project.checks),
+                sum(len(x.outstanding) for x in project.checks),
+                len([x for x in project.checks if x.latest]),
+                "ok" if ok else "FAILED",
+            )
+        )
+    failed = [x for x in projects if x.error or any(y.error for y in x.checks)]
+    for project in failed:
+        print()
+        rprint(
+            "[red]{}".format(os.path.relpath(project.folder, workspace.folder))
+        )
+        if project.error:
+            rprint("[red]  {}".format(project.error))
+        for check in project.checks:
+            if check.error:
+                rprint("[red]  {:<30} {}".format(check.name, check.error))
+    print()
+    rprint(
+        "[{}]{} of {} projects failed".format(
+            "red" if failed else "green", len(failed), len(projects)
+        )
+    )
+    return failed
+
+
+def display_usage(index, name, version_range=None):
+    """Display the projects using each version of an app.
+
+    Keyword arguments:
+    version_range -- e.g. ``>=0.2.40,<0.3`` (``semantic_version.SimpleSpec``)
+
+    """
+    import semantic_version
+
+    name = app_name(name[3:] if name.startswith("kb-") else name)
+    spec = None
+    if version_range:
+        spec = semantic_version.SimpleSpec(version_range)
+    versions = index.get(name, {})
+    print()
+    rprint(
+        "[yellow]Projects using '{}'{}...".format(
+            name, " ({})".format(version_range) if spec else ""
+        )
+    )
+    semvers = {}
+    invalid = []
+    for tag in versions:
+        try:
+            semver = tag_to_semver(tag)
+        except ValueError:
+            semver = None
+        if semver:
+            semvers[tag] = semver
+        else:
+            invalid.append(tag)
+    count = 0
+    for tag in sorted(semvers, key=semvers.get, reverse=True):
+        if spec and not spec.match(semvers[tag]):
+            continue
+        for folder in versions[tag]:
+            count = count + 1
+            rprint("[white]{:<10} {}".format(tag, folder))
+    rprint("[cyan]{} projects".format(count))
+    # not a KB version number, so we cannot sort (or match) these
+    for tag in sorted(invalid):
+        for folder in versions[tag]:
+            rprint("[red]{:<10} {} (invalid version)".format(tag, folder))
+
+
+def display_maintenance(result):
+    print()
+    rprint("[yellow]GIT maintenance (time to walk the history of the branch)")
+    rprint(
+        "[white]{:<30} {:>10} {:>10} {:>8} {:>8}".format(
+            "app", "before", "after", "loose", "loose"
+        )
+    )
+    for item in result:
+        if item.error:
+            rprint("[red]{:<30} {}".format(item.name, item.error))
+            continue
+        rprint(
+            "[{}]{:<30} {:>7.1f} ms {:>7.1f} ms {:>8} {:>8}".format(
+                "green" if item.after <= item.before else "cyan",
+                item.name,
+                item.before * 1000,
+                item.after * 1000,
+                item.loose_before,
+                item.loose_after,
+            )
+        )
+
+
+def display_provision(result):
+    print()
+    rprint("[yellow]Provision the apps...")
+    for item in result:
+        if item.error:
+            rprint("[red]{:<30} {}".format(item.name, item.error))
+        elif item.cloned:
+            rprint(
+                "[green]{:<30} {:<20} cloned in {:.1f} seconds".format(
+                    item.name, item.branch, item.seconds
                 )
-                for commit in commits:
-                    if commit.message.startswith("version "):
-                        pos = commit.message.find(" ")
-                        if pos == -1:
-                            raise Exception(
-                                "The commit message has a space, but we "
-                                "can't find it: {}".format(commit.message)
-                            )
-                        else:
-                            semver = tag_to_semver(commit.message[pos + 1 :])
-                            if semver:
-                                if not first_tag:
-                                    first_tag = semver
-                                if semver == tag_to_find:
-                                    found = True
-                                    if first and first > semver:
-                                        print(
-                                            "* Warning: version {} of '{}' has "
-                                            "been released. You are using version "
-                                            "{}.".format(
-                                                first, app.name, semver
-                                            )
-                                        )
-                                    if outstanding:
-                                        print(
-                                            "* Warning: there are {} changes on {} "
-                                            "which have not been released.".format(
-                                                len(outstanding), app.name
-                                            )
-                                        )
-                                        for count, x in enumerate(
-                                            outstanding, 1
-                                        ):
-                                            first_line = x.split("\n")[
-                                                0
-                                            ].strip()
-                                            print(
-                                                "  {}. {}".format(
-                                                    count, first_line
-                                                )
-                                            )
-                                    break
-                                if not first:
-                                    first = semver
-                    outstanding.append(
-                        "{} ({})".format(commit.message.strip(), commit.author)
-                    )
-                if not found:
-                    raise Exception(
-                        "Cannot find tag '{}' on the '{}' branch of "
-                        "'{}'{}".format(
-                            tag_to_find,
-                            app.branch,
-                            app_to_folder(app.name),
-                            " (but found {})".format(first_tag)
-                            if first_tag
-                            else "",
-                        )
-                    )
+            )
         else:
-            raise Exception(
-                "Expecting the '{}' app to be on the '{}' branch but it is "
-                "on '{}'".format(app.name, app.branch, repo.active_branch)
+            rprint(
+                "[white]{:<30} {:<20} exists".format(item.name, item.branch)
+            )
+    errors = [x for x in result if x.error]
+    print()
+    rprint(
+        "[{}]{} cloned, {} of {} apps failed".format(
+            "red" if errors else "green",
+            len([x for x in result if x.cloned]),
+            len(errors),
+            len(result),
+        )
+    )
+    return errors
+
+
+def display_unreleased(result):
+    print()
+    rprint("[yellow]Changes since the latest release of each app...")
+    for item in result:
+        if item.error:
+            rprint("[red]{:<30} {}".format(item.name, item.error))
+            continue
+        rprint(
+            "[{}]{:<30} {:<20} {:<10} ahead by {}".format(
+                "cyan" if item.count else "white",
+                item.name,
+                item.branch,
+                item.tag or "-",
+                item.count,
             )
+        )
+        for count, summary in enumerate(item.summaries, 1):
+            print("  {}. {}".format(count, summary))
 
 
-def git_repo(app):
-    folder = os.path.abspath(
-        os.path.join(
-            os.path.dirname(os.path.realpath(__file__)),
-            "..",
-            "..",
-            "app",
-            app_to_folder(app.name),
+def load_check_cache(fingerprint):
+    """The cached result of ``check`` (if the fingerprint has not changed).
+
+    Returns a list of ``GitCheck`` or ``None``.
+
+    """
+    result = None
+    file_name = check_cache_file_name()
+    if file_name.exists():
+        with open(file_name) as f:
+            data = json.load(f)
+        if data["fingerprint"] == fingerprint:
+            result = [GitCheck(**x) for x in data["checks"]]
+    return result
+
+
+def save_check_cache(fingerprint, checks):
+    file_name = check_cache_file_name()
+    file_name.parent.mkdir(parents=True, exist_ok=True)
+    with open(file_name, "w") as f:
+        json.dump(
+            {
+                "fingerprint": fingerprint,
+                "checks": [attr.asdict(x) for x in checks],
+            },
+            f,
         )
+
+
+def git(
+    apps_with_branch,
+    apps_with_tag,
+    is_project,
+    checkout,
+    pull,
+    jobs=1,
+    pull_jobs=None,
+):
+    """Check each app is on the expected branch.
+
+    The apps are checked in a pool of ``jobs`` threads.  The results are
+    displayed in the same order as ``apps_with_branch`` and any errors are
+    reported after all the apps have been checked.
+
+    """
+    checks = git_checks(
+        apps_with_branch,
+        apps_with_tag,
+        is_project,
+        checkout,
+        pull,
+        jobs,
+        pull_jobs,
+        progress=checkout or pull,
     )
-    if os.path.exists(folder):
-        return Repo(folder)
-    else:
-        raise Exception("App folder does not exist: {}".format(folder))
+    display_git_checks(checks)
+    errors = [x for x in checks if x.error]
+    if errors:
+        raise KbError(
+            "{} of {} apps failed the git checks: {}".format(
+                len(errors), len(checks), ", ".join(x.name for x in errors)
+            )
+        )
+    return checks
+
+
+def git_check(
+    app,
+    tags,
+    is_project,
+    checkout,
+    pull,
+    limit=None,
+    status=None,
+    workspace=None,
+):
+    """Check the branch (and release) for an app.
 
+    Returns a ``GitCheck`` (errors are not raised, they are returned in
+    ``GitCheck.error``).
 
-def local(is_project):
+    Keyword arguments:
+    limit -- held while we checkout or pull (to limit the network and disk)
+    status -- called with a description of each step
+    workspace -- share the app repositories (see ``Workspace``)
+
+    """
+    limit = limit or contextlib.nullcontext()
+    status = status or (lambda description: None)
+    result = GitCheck(name=app.name, branch=app.branch)
+    try:
+        with contextlib.ExitStack() as stack:
+            if workspace is None:
+                workspace = stack.enter_context(Workspace())
+            repo = workspace.repo(app)
+            with limit:
+                if checkout:
+                    status("[cyan]checkout")
+                is_branch = branch_is_equal(app, repo, checkout)
+                if is_branch and pull:
+                    status("[cyan]ls-remote")
+                    heads = remote_heads(repo)
+                    if repo.rev_parse(app.branch) == heads.get(app.branch):
+                        result.pull = ["up to date"]
+                    else:
+                        status("[cyan]pulling")
+                        result.pull = repo.pull()
+            if not is_branch:
+                raise KbError(
+                    "Expecting the '{}' app to be on the '{}' branch but it "
+                    "is on '{}'".format(
+                        app.name, app.branch, repo.active_branch()
+                    )
+                )
+            # only check tags if this is a project
+            if is_project:
+                status("[cyan]checking")
+                _git_check_tag(app, repo, tags[app.name], result)
+        status("[green]done")
+    except Exception as e:
+        result.error = e.value if isinstance(e, KbError) else str(e)
+        status("[red]failed")
+    return result
+
+
+def git_check_warnings(check):
+    """The warnings for a ``GitCheck`` (a newer or an unreleased version)."""
+    result = []
+    if check.latest:
+        result.append(
+            "version {} of '{}' has been released. You are using version "
+            "{}.".format(check.latest, check.name, check.tag)
+        )
+    if check.outstanding:
+        result.append(
+            "there are {} changes on {} which have not been released.".format(
+                len(check.outstanding), check.name
+            )
+        )
+    return result
+
+
+def git_checks(
+    apps_with_branch,
+    apps_with_tag,
+    is_project,
+    checkout,
+    pull,
+    jobs,
+    pull_jobs=None,
+    progress=False,
+    workspace=None,
+):
+    """Check the apps in a pool of ``jobs`` threads.
+
+    If we are pulling (or checking out) the apps, then ``pull_jobs`` can be
+    used to pull more apps at the same time than we are checking.  The
+    check for an app starts as soon as its pull has finished.
+
+    Returns a list of ``GitCheck`` (in the same order as
+    ``apps_with_branch``).
+
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    from rich.progress import Progress, TextColumn
+
+    tags = {x.name: x.semantic_version for x in apps_with_tag}
+    limit = None
+    workers = jobs
+    if pull_jobs and (checkout or pull):
+        limit = threading.BoundedSemaphore(pull_jobs)
+        workers = max(jobs, pull_jobs)
+    with contextlib.ExitStack() as stack:
+        if workspace is None:
+            workspace = stack.enter_context(Workspace())
+        status = {}
+        if progress:
+            display = stack.enter_context(
+                Progress(
+                    TextColumn("{task.fields[app]:<30}"),
+                    TextColumn("{task.description}"),
+                )
+            )
+            for app in apps_with_branch:
+                task_id = display.add_task("[white]waiting", app=app.name)
+                status[app.name] = lambda description, task_id=task_id: (
+                    display.update(task_id, description=description)
+                )
+
+        def _check(app):
+            return git_check(
+                app,
+                tags,
+                is_project,
+                checkout,
+                pull,
+                limit,
+                status.get(app.name),
+                workspace,
+            )
+
+        if workers > 1:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                result = list(executor.map(_check, apps_with_branch))
+        else:
+            result = [_check(app) for app in apps_with_branch]
+    return result
+
+
+def git_repo(app):
+    """The repository for an app (close it when you have finished)."""
+    return Workspace().repo(app)
+
+
+def local(is_project, folder=None):
     """Parse the local requirements.
 
     Example::
@@ -958,7 +2695,7 @@ def local(is_project):
 
     """
     result = []
-    with open(os.path.join("requirements", "local.txt")) as f:
+    with open(os.path.join(folder or "", "requirements", "local.txt")) as f:
         for line in f:
             if is_project:
                 token = "/app/"
@@ -980,16 +2717,73 @@ def local(is_project):
     return result
 
 
-def production():
+def maintain(apps, jobs=1, register=False, workspace=None):
+    """GIT maintenance for the app repositories (in a pool of ``jobs``).
+
+    Write a commit-graph (with Bloom filters), pack the loose objects and
+    prune.  The time to walk the history of the branch is measured before
+    and after.
+
+    Keyword arguments:
+    register -- add each app to the GIT background maintenance
+                (``git maintenance register``)
+
+    Returns a list of ``Maintenance`` (in the same order as ``apps``).
+
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    def _walk(repo, branch):
+        """The fastest of three walks of the history (in seconds)."""
+        result = []
+        for _ in range(3):
+            # forget the saved log
+            repo.changed()
+            start = time.perf_counter()
+            repo.log(branch)
+            result.append(time.perf_counter() - start)
+        return min(result)
+
+    def _maintain(app):
+        result = Maintenance(name=app.name)
+        try:
+            repo = workspace.repo(app)
+            result.before = _walk(repo, app.branch)
+            result.loose_before = repo.count_objects()["count"]
+            repo.commit_graph_write()
+            repo.repack()
+            repo.prune()
+            if register:
+                repo.maintenance_register()
+            result.after = _walk(repo, app.branch)
+            result.loose_after = repo.count_objects()["count"]
+        except KbError as e:
+            result.error = e.value
+        return result
+
+    with contextlib.ExitStack() as stack:
+        if workspace is None:
+            workspace = stack.enter_context(Workspace())
+        with ThreadPoolExecutor(max_workers=jobs) as executor:
+            return list(executor.map(_maintain, apps))
+
+
+def production(folder=None, semver=True):
     """Parse the production requirements.
 
     Example::
 
       kb-base==0.2.55
 
+    Keyword arguments:
+    semver -- convert each tag to a semantic version (``False`` keeps a tag
+              which is not a KB version number e.g. ``0.2.beta``)
+
     """
     result = []
-    with open(os.path.join("requirements", "production.txt")) as f:
+    with open(
+        os.path.join(folder or "", "requirements", "production.txt")
+    ) as f:
         for line in f:
             pos_dash = line.find("kb-")
             pos_equal = line.find("==")
@@ -998,17 +2792,432 @@ def production():
             else:
                 name = line[pos_dash + 3 : pos_equal]
                 tag = line[pos_equal + 2 :].strip()
+                semantic_version = None
+                if semver:
+                    try:
+                        semantic_version = tag_to_semver(tag)
+                    except ValueError:
+                        raise KbError(
+                            "Invalid version '{}' for 'kb-{}' in "
+                            "'production.txt'".format(tag, name)
+                        )
                 result.append(
                     App(
                         name=app_name(name),
                         branch=None,
                         tag=tag,
-                        semantic_version=tag_to_semver(tag),
+                        semantic_version=semantic_version,
+                    )
+                )
+    return result
+
+
+def release_apps(
+    names,
+    prefix,
+    pypi,
+    jobs=1,
+    ls_files=False,
+    workspace=None,
+    fsmonitor=False,
+):
+    """Release several apps (e.g. ``base``, ``login`` and ``mail``).
+
+    An app is released after the apps it depends on (see ``release_order``).
+    The apps which do not depend on each other are released at the same
+    time.  The version number for each app is the next version from
+    ``setup.yaml`` (see ``Release._get_next_version``).
+
+    Returns a dict of the released versions.
+
+    """
+    import multiprocessing
+    import yaml
+
+    from concurrent.futures import ProcessPoolExecutor
+    from rich.prompt import Prompt
+
+    workspace = workspace or Workspace()
+    levels = release_order(names, workspace)
+    rprint("[yellow]check the apps...")
+    folders = {}
+    versions = {}
+    for name in [x for level in levels for x in level]:
+        folder = workspace.app_folder(
+            App(name=name, branch=None, tag=None, semantic_version=None)
+        )
+        has_package_json = os.path.exists(os.path.join(folder, "package.json"))
+        if has_package_json and not front_end_script(folder):
+            raise KbError(
+                "'{}' has a 'package.json' file, but no script to rebuild "
+                "the SCSS (release it on its own)".format(app_to_folder(name))
+            )
+        project = check_project(folder, False, workspace)
+        errors = [x.error for x in project.checks if x.error]
+        if project.error:
+            errors.insert(0, project.error)
+        if errors:
+            raise KbError(
+                "Cannot release '{}': {}".format(
+                    app_to_folder(name), "; ".join(errors)
+                )
+            )
+        with open(os.path.join(folder, FILENAME_SETUP_YAML)) as f:
+            current_version = yaml.safe_load(f)["version"]
+        folders[name] = folder
+        versions[name] = (
+            current_version,
+            Release(prefix, pypi)._get_next_version(current_version),
+        )
+    rprint("[white]{:<6} {:<30} {:>10} {:>10}".format("", "app", "from", "to"))
+    for count, level in enumerate(levels, start=1):
+        for name in level:
+            rprint(
+                "[cyan]{:<6} {:<30} {:>10} {:>10}".format(
+                    count, app_to_folder(name), *versions[name]
+                )
+            )
+    confirm = Prompt.ask(
+        "Please confirm you want to release these versions (y/N)",
+        choices=["Y", "N", "y", "n"],
+        default="N",
+    )
+    if not confirm.upper() == "Y":
+        raise KbError("You chose No. Nothing was released.")
+    result = {}
+    # 'Release' uses the current folder, so each app has its own process
+    context = multiprocessing.get_context("spawn")
+    for count, level in enumerate(levels, start=1):
+        rprint("[yellow]{}. release {}...".format(count, ", ".join(level)))
+        with ProcessPoolExecutor(
+            max_workers=min(jobs, len(level)), mp_context=context
+        ) as executor:
+            futures = [
+                (
+                    x,
+                    executor.submit(
+                        _release_app,
+                        folders[x],
+                        prefix,
+                        pypi,
+                        ls_files,
+                        fsmonitor,
+                    ),
+                )
+                for x in level
+            ]
+            failed = []
+            for name, future in futures:
+                version, output, error = future.result()
+                print(output, end="")
+                if error:
+                    rprint("[red]{}: {}".format(app_to_folder(name), error))
+                    failed.append(name)
+                else:
+                    rprint(
+                        "[green]{} {} released".format(
+                            app_to_folder(name), version
+                        )
                     )
+                    result[name] = version
+        if failed:
+            raise KbError(
+                "Failed to release {} (so did not release {})".format(
+                    ", ".join(failed),
+                    ", ".join(x for y in levels[count:] for x in y) or "-",
                 )
+            )
     return result
 
 
+def release_index(repo, branch):
+    """Find the release commits on a branch e.g. ``version 0.2.05``.
+
+    Returns a list of ``[sha, tag]`` (newest first).
+
+    The index is saved in the ``.git`` folder of the app.  For each branch,
+    we save the head of the branch, so the next time we only need to check
+    the new commits.  If the branch has been re-written (the old head is no
+    longer an ancestor), then the index is rebuilt.
+
+    """
+    file_name = pathlib.Path(repo.git_dir, FILENAME_RELEASE_INDEX)
+    data = {}
+    if file_name.exists():
+        with open(file_name) as f:
+            data = json.load(f)
+    head = repo.rev_parse(branch)
+    index = data.get(branch)
+    if index and index["head"] == head:
+        return index["releases"]
+    if index and repo.is_ancestor(index["head"], head):
+        rev = "{}..{}".format(index["head"], head)
+        releases = index["releases"]
+    else:
+        rev = head
+        releases = []
+    found = []
+    for commit in repo.log(rev):
+        if commit.summary.startswith("version "):
+            tag = commit.summary[len("version ") :].strip()
+            try:
+                is_release = bool(tag_to_semver(tag))
+            except ValueError:
+                # not a KB version number e.g. 'version 1.2.beta'
+                is_release = False
+            if is_release:
+                found.append([commit.sha, tag])
+    data[branch] = {"head": head, "releases": found + releases}
+    temp_file_name = file_name.with_suffix(
+        ".{}.{}.tmp".format(os.getpid(), threading.get_ident())
+    )
+    with open(temp_file_name, "w") as f:
+        json.dump(data, f)
+    os.replace(temp_file_name, file_name)
+    return data[branch]["releases"]
+
+
+def release_order(names, workspace):
+    """Sort the apps, so each app is released after the apps it depends on.
+
+    The dependencies are the apps in ``requirements/local.txt``
+    e.g. ``-e ../base``.
+
+    Returns a list of levels.  The apps in a level do not depend on each
+    other e.g. ``[["base"], ["login", "mail"]]``.
+
+    """
+    depends = {}
+    for name in names:
+        app = App(
+            name=app_name(name), branch=None, tag=None, semantic_version=None
+        )
+        folder = workspace.app_folder(app)
+        if not os.path.exists(folder):
+            raise KbError("App folder does not exist: {}".format(folder))
+        depends[app.name] = set(x.name for x in local(False, folder))
+    result = []
+    while depends:
+        level = sorted(x for x, y in depends.items() if not y & depends.keys())
+        if not level:
+            raise KbError(
+                "The apps depend on each other: {}".format(
+                    ", ".join(sorted(depends))
+                )
+            )
+        result.append(level)
+        for name in level:
+            del depends[name]
+    return result
+
+
+def unreleased(apps, jobs=1, workspace=None):
+    """Count the changes on each app branch since the latest release.
+
+    The release commit is found using the ``release_index``, and the changes
+    (``<release>..<branch>``) are read from one ``git log`` for each app.
+    The apps are checked in a pool of ``jobs`` threads.
+
+    Returns a list of ``Unreleased`` (in the same order as ``apps``).
+
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    def _unreleased(app):
+        result = Unreleased(name=app.name, branch=app.branch)
+        try:
+            repo = workspace.repo(app)
+            releases = release_index(repo, app.branch)
+            rev = app.branch
+            if releases:
+                result.sha, result.tag = releases[0]
+                rev = "{}..{}".format(result.sha, app.branch)
+            commits = repo.log(rev)
+            result.count = len(commits)
+            result.summaries = [
+                "{} ({})".format(x.summary.strip(), x.author) for x in commits
+            ]
+        except KbError as e:
+            result.error = e.value
+        return result
+
+    with contextlib.ExitStack() as stack:
+        if workspace is None:
+            workspace = stack.enter_context(Workspace())
+        with ThreadPoolExecutor(max_workers=jobs) as executor:
+            return list(executor.map(_unreleased, apps))
+
+
+def usage_index(workspace):
+    """The projects using each version of each app (from ``production.txt``).
+
+    The versions for each project are saved in ``~/.cache/kb/`` and only
+    re-read if the modified time of ``production.txt`` has changed.
+
+    Returns a ``dict`` e.g. ``{"base": {"0.2.40": ["project/hatherleigh"]}}``
+
+    """
+    import hashlib
+
+    file_name = CACHE_FOLDER.joinpath(
+        "usage-{}.json".format(
+            hashlib.sha256(workspace.folder.encode()).hexdigest()[:16]
+        )
+    )
+    cache = {}
+    if file_name.exists():
+        with open(file_name) as f:
+            cache = json.load(f)
+    projects = {}
+    for folder, is_project in workspace.projects():
+        if not is_project:
+            continue
+        name = os.path.relpath(folder, workspace.folder)
+        try:
+            mtime = os.stat(
+                os.path.join(folder, "requirements", "production.txt")
+            ).st_mtime
+        except FileNotFoundError:
+            continue
+        if name in cache and cache[name]["mtime"] == mtime:
+            projects[name] = cache[name]
+        else:
+            projects[name] = {
+                "mtime": mtime,
+                "apps": {
+                    x.name: x.tag for x in production(folder, semver=False)
+                },
+            }
+    if projects != cache:
+        file_name.parent.mkdir(parents=True, exist_ok=True)
+        with open(file_name, "w") as f:
+            json.dump(projects, f)
+    result = {}
+    for name, project in sorted(projects.items()):
+        for app, tag in project["apps"].items():
+            result.setdefault(app, {}).setdefault(tag, []).append(name)
+    return result
+
+
+def provision(apps, jobs=PULL_JOBS, reference=None, workspace=None):
+    """Clone the apps which do not have a folder in the workspace.
+
+    The apps are cloned (in a pool of ``jobs`` threads) on the branch from
+    ``ci.txt``.  We use a blob-less partial clone (the file contents are
+    downloaded when they are needed), or if ``reference`` is a folder
+    containing a mirror of the app (e.g. ``base.git``), the objects are
+    borrowed from the mirror.
+
+    Returns a list of ``Provision`` (in the same order as ``apps``).
+
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    def _clone(app):
+        folder = workspace.app_folder(app)
+        result = Provision(name=app.name, branch=app.branch, folder=folder)
+        if os.path.exists(folder):
+            return result
+        if not app.url:
+            result.error = "Cannot find the URL for the app in 'ci.txt'"
+            return result
+        command = ["git", "clone", "--quiet", "--branch", app.branch]
+        mirror = None
+        if reference:
+            mirror = os.path.join(
+                reference, "{}.git".format(app_to_folder(app.name))
+            )
+        if mirror and os.path.isdir(mirror):
+            command = command + ["--reference", mirror]
+        else:
+            command = command + ["--filter=blob:none"]
+        start = time.perf_counter()
+        out = subprocess.run(
+            command + [app.url, folder], capture_output=True, text=True
+        )
+        result.seconds = time.perf_counter() - start
+        if out.returncode:
+            result.error = out.stderr.strip()
+        else:
+            result.cloned = True
+        return result
+
+    with contextlib.ExitStack() as stack:
+        if workspace is None:
+            workspace = stack.enter_context(Workspace())
+        with ThreadPoolExecutor(max_workers=jobs) as executor:
+            return list(executor.map(_clone, apps))
+
+
+def pypirc(index):
+    """The 'repository', 'username' and 'password' from ``~/.pypirc``."""
+    import configparser
+
+    config = configparser.ConfigParser(interpolation=None)
+    config.read(PYPIRC)
+    if not config.has_section(index):
+        raise KbError("Cannot find '[{}]' in '{}'".format(index, PYPIRC))
+    section = config[index]
+    return {
+        "repository": section.get(
+            "repository", "https://upload.pypi.org/legacy/"
+        ),
+        "username": section.get("username", ""),
+        "password": section.get("password", ""),
+    }
+
+
+def remote_heads(repo, remote="origin"):
+    """The head of each branch on the remote (using ``git ls-remote``).
+
+    The heads are saved for each remote URL, so the remote is only queried
+    once (even if it is shared by several apps).
+
+    """
+    url = repo.remote_url(remote) or "{}:{}".format(repo.folder, remote)
+    with _remote_heads_lock:
+        if url not in _remote_heads:
+            _remote_heads[url] = {"lock": threading.Lock(), "heads": None}
+        data = _remote_heads[url]
+    with data["lock"]:
+        if data["heads"] is None:
+            data["heads"] = repo.ls_remote(remote)
+    return data["heads"]
+
+
+def requirements_comparisons(is_project, folder=None):
+    """The requirements files to compare (see ``check_requirements``).
+
+    Returns the apps in ``ci.txt`` and ``production.txt`` and a list of
+    ``(compare, x_apps, y_apps, x_caption, y_caption)``.
+
+    """
+    ci_apps = ci(folder)
+    branch_apps = branch("branch.txt", folder=folder)
+    local_apps = local(is_project, folder)
+    if is_project:
+        production_apps = production(folder)
+    else:
+        production_apps = []
+    comparisons = [
+        (apps_equal, ci_apps, branch_apps, "ci.txt", "branch.txt"),
+        (apps_equal, ci_apps, local_apps, "ci.txt", "local.txt"),
+    ]
+    if is_project:
+        comparisons.append(
+            (apps_equal, ci_apps, production_apps, "ci.txt", "production.txt")
+        )
+    comparisons.append(
+        (branches_equal, ci_apps, branch_apps, "ci.txt", "branch.txt")
+    )
+    return ci_apps, production_apps, comparisons
+
+
+def safe_name(name):
+    """Same as ``pkg_resources.safe_name`` (which is slow to import)."""
+    return re.sub("[^A-Za-z0-9.]+", "-", name)
+
+
 def tag_to_semver(tag):
     """Convert a KB version number e.g. '0.2.05' to a semantic version.
 
@@ -1017,6 +3226,8 @@ def tag_to_semver(tag):
              - so ``0.2.05`` should be ``0.2.5``.
 
     """
+    import semantic_version
+
     major = minor = patch = result = None
     try:
         major, minor, patch = tag.split(".")
@@ -1029,7 +3240,116 @@ def tag_to_semver(tag):
     return result
 
 
+def watch(is_project, jobs=1):
+    """Check the apps again when the requirements or an app branch changes.
+
+    If the requirements change, then everything is checked.  If the
+    'HEAD' (or refs) of an app change e.g. ``git checkout``, then only that
+    app is checked.
+
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    apps = {}
+    checks = {}
+    tags = {}
+    # 'None' is the key for the requirements
+    changed = {None}
+    with Workspace() as workspace, Watcher() as watcher:
+        while True:
+            if None in changed:
+                watcher.clear()
+                watcher.add("requirements", None, ["*.txt"])
+                apps = {}
+                checks = {}
+                try:
+                    ci_apps, production_apps = check_requirements(is_project)
+                    tags = {
+                        x.name: x.semantic_version for x in production_apps
+                    }
+                    apps = {x.name: (x, is_project) for x in ci_apps}
+                    for x in branch("ember.txt", allow_missing_file=True):
+                        apps[x.name] = (x, False)
+                except (KbError, OSError, ValueError) as e:
+                    rprint(
+                        "[red]{}".format(
+                            e.value if isinstance(e, KbError) else str(e)
+                        )
+                    )
+                for name, (app, check_tags) in apps.items():
+                    try:
+                        git_dir = str(workspace.repo(app).git_dir)
+                    except KbError:
+                        continue
+                    watcher.add(git_dir, name, ["HEAD", "packed-refs"])
+                    for path, subdirs, files in os.walk(
+                        os.path.join(git_dir, "refs")
+                    ):
+                        watcher.add(path, name)
+                changed = set(apps)
+            names = [x for x in apps if x in changed]
+            for name in names:
+                try:
+                    # forget the status and log
+                    workspace.repo(apps[name][0]).changed()
+                except KbError:
+                    pass
+
+            def _check(name):
+                app, check_tags = apps[name]
+                return git_check(
+                    app, tags, check_tags, False, False, workspace=workspace
+                )
+
+            with ThreadPoolExecutor(max_workers=jobs) as executor:
+                for check in executor.map(_check, names):
+                    checks[check.name] = check
+            print()
+            rprint(
+                "[yellow]{} checked {}".format(
+                    time.strftime("%H:%M:%S"), ", ".join(names) or "-"
+                )
+            )
+            display_git_checks([checks[x] for x in names])
+            errors = [x for x in checks.values() if x.error]
+            if errors or not apps:
+                rprint(
+                    "[red]{} of {} apps failed: {}".format(
+                        len(errors),
+                        len(apps),
+                        ", ".join(x.name for x in errors) or "-",
+                    )
+                )
+            else:
+                rprint("[green]All looking good :)")
+            rprint("[white]watching for changes (Ctrl+C to stop)...")
+            changed = watcher.wait()
+
+
+def workspace_report(workspace, jobs=1):
+    """Check every project (and app) in the workspace (see ``check_report``).
+
+    The projects are checked in a pool of ``jobs`` threads.
+
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        projects = list(
+            executor.map(
+                lambda x: check_report(x[1], folder=x[0], workspace=workspace),
+                workspace.projects(),
+            )
+        )
+    return dict(
+        workspace=workspace.folder,
+        ok=all(x["ok"] for x in projects),
+        projects=projects,
+    )
+
+
 if __name__ == "__main__":
+    front_end_version(sys.argv[1:])
     parser = argparse.ArgumentParser(
         description="Check the requirements for your project or app"
     )
@@ -1038,15 +3358,124 @@ if __name__ == "__main__":
         action="store_true",
         help="pull the latest app code from git",
     )
+    parser.add_argument(
+        "--fsmonitor",
+        action="store_true",
+        help=(
+            "use the GIT file system monitor and untracked cache "
+            "(faster 'git status' when releasing a large app)"
+        ),
+    )
+    parser.add_argument(
+        "--format",
+        choices=["text", "json"],
+        default="text",
+        help=(
+            "'json' to print the result of the checks as a JSON document "
+            "(the apps are not pulled or checked out)"
+        ),
+    )
+    parser.add_argument(
+        "--ls-files",
+        action="store_true",
+        help="use the GIT index to find the files to release",
+    )
+    parser.add_argument(
+        "--maintenance",
+        action="store_true",
+        help=(
+            "GIT maintenance for the apps in 'ci.txt' "
+            "(commit-graph, repack and prune)"
+        ),
+    )
+    parser.add_argument(
+        "--maintenance-register",
+        action="store_true",
+        help="add the apps to the GIT background maintenance (--maintenance)",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="check everything (even if nothing has changed)",
+    )
+    parser.add_argument(
+        "--provision",
+        action="store_true",
+        help="clone the apps in 'ci.txt' which do not have a folder",
+    )
     parser.add_argument(
         "--pull", action="store_true", help="pull the latest app code from git"
     )
     parser.add_argument(
         "--release", action="store_true", help="release the app (or project)"
     )
+    parser.add_argument(
+        "--release-apps",
+        metavar="APP",
+        nargs="+",
+        help=(
+            "release several apps from the workspace (in dependency order) "
+            "e.g. 'base login mail'"
+        ),
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=1,
+        help="number of apps to check at the same time",
+    )
+    parser.add_argument(
+        "--pull-jobs",
+        type=int,
+        default=PULL_JOBS,
+        help="number of apps to pull (or checkout) at the same time",
+    )
     parser.add_argument("--prefix", help="prefix for the company e.g. 'kb'")
     parser.add_argument(
-        "--pypi", help="the name of the pypi in your '~/.pypirc' file"
+        "--reference",
+        metavar="FOLDER",
+        help=(
+            "a folder of mirrors e.g. 'base.git' "
+            "(to clone the apps for '--provision')"
+        ),
+    )
+    parser.add_argument(
+        "--pypi",
+        help=(
+            "the name of the pypi in your '~/.pypirc' file "
+            "(or a comma separated list to upload to more than one)"
+        ),
+    )
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help=(
+            "check again when the requirements (or the branch of an app) "
+            "change"
+        ),
+    )
+    parser.add_argument(
+        "--who-uses",
+        metavar="APP",
+        help="list the projects in the workspace using an app e.g. 'kb-base'",
+    )
+    parser.add_argument(
+        "--version-range",
+        help="only list these versions (for '--who-uses') e.g. '>=0.2.40'",
+    )
+    parser.add_argument(
+        "--workspace",
+        nargs="?",
+        const=True,
+        help=(
+            "check every project and app in the workspace "
+            "(default '~/dev/', the folder above 'module/toolbox/')"
+        ),
+    )
+    parser.add_argument(
+        "--unreleased",
+        action="store_true",
+        help="count the changes on each app since the latest release",
     )
     parser.add_argument(
         "--version-config",
@@ -1059,43 +3488,99 @@ if __name__ == "__main__":
         help="generate 'dist/VERSION.txt' from 'package.json'",
     )
     args = parser.parse_args()
-    if args.version_config:
-        update_config_environment()
-        exit("Complete...")
-    if args.version_txt:
-        create_dist_version_txt()
-        exit("Complete...")
     if args.pull:
         print("  pulling the latest app code from git...")
-    if args.release:
+    if args.release or args.release_apps:
         if not args.prefix:
             exit("'release' requires the company prefix")
         if not args.pypi:
             exit("'release' requires the pypi name")
+    if args.who_uses:
+        with Workspace(
+            None if args.workspace in (None, True) else args.workspace
+        ) as workspace:
+            display_usage(
+                usage_index(workspace), args.who_uses, args.version_range
+            )
+        exit()
+    if args.release_apps:
+        with Workspace(
+            None if args.workspace in (None, True) else args.workspace
+        ) as workspace:
+            release_apps(
+                args.release_apps,
+                args.prefix,
+                args.pypi,
+                args.jobs,
+                args.ls_files,
+                workspace,
+                args.fsmonitor,
+            )
+        exit()
+    if args.workspace:
+        # only display warnings (the workspace has a summary)
+        logger.setLevel(logging.WARNING)
+        with Workspace(
+            None if args.workspace is True else args.workspace
+        ) as workspace:
+            if args.format == "json":
+                report = workspace_report(workspace, args.jobs)
+                print(json.dumps(report, indent=2))
+                exit(0 if report["ok"] else 1)
+            projects = check_workspace(workspace, args.jobs)
+            if display_workspace(workspace, projects):
+                exit(1)
+        exit()
+    if args.unreleased:
+        display_unreleased(unreleased(ci(), args.jobs))
+        exit()
+    if args.provision:
+        apps = ci()
+        if os.path.exists(os.path.join("requirements", "ember.txt")):
+            apps = apps + branch("ember.txt")
+        if display_provision(provision(apps, args.pull_jobs, args.reference)):
+            exit(1)
+        exit()
+    if args.maintenance:
+        apps = ci()
+        if os.path.exists(os.path.join("requirements", "ember.txt")):
+            apps = apps + branch("ember.txt")
+        display_maintenance(
+            maintain(apps, args.jobs, args.maintenance_register)
+        )
+        exit()
     is_project = get_is_project()
-    ci_apps = ci()
-    branch_apps = branch("branch.txt")
-    local_apps = local(is_project)
-    if is_project:
-        production_apps = production()
+    if args.watch:
+        try:
+            watch(is_project, args.jobs)
+        except KeyboardInterrupt:
+            print()
+        exit()
+    if args.format == "json":
+        logger.setLevel(logging.WARNING)
+        report = check_report(is_project, args.jobs)
+        print(json.dumps(report, indent=2))
+        exit(0 if report["ok"] else 1)
+    checks = fingerprint = None
+    # 'checkout' and 'pull' change the apps, so always do a full check
+    if not (args.no_cache or args.checkout or args.pull):
+        fingerprint = check_fingerprint(is_project, args.jobs)
+        checks = load_check_cache(fingerprint)
+    if checks is None:
+        checks = check(
+            is_project, args.checkout, args.pull, args.jobs, args.pull_jobs
+        )
+        if fingerprint:
+            save_check_cache(fingerprint, checks)
     else:
-        production_apps = []
-    # check
-    apps_equal(ci_apps, branch_apps, "ci.txt", "branch.txt")
-    apps_equal(ci_apps, local_apps, "ci.txt", "local.txt")
-    if is_project:
-        apps_equal(ci_apps, production_apps, "ci.txt", "production.txt")
-    branches_equal(ci_apps, branch_apps, "ci.txt", "branch.txt")
-    git(ci_apps, production_apps, is_project, args.checkout, args.pull)
-    # ember
-    ember_apps = branch("ember.txt", allow_missing_file=True)
-    if ember_apps:
-        check_ember_branches(ember_apps, args.checkout, args.pull)
+        display_git_checks(checks)
+        logger.info("Nothing has changed (use '--no-cache' for a full check)")
     if not is_project:
         logger.info(
             "Note: This is an 'app', so we are not checking 'production.txt'"
         )
     logger.info("All looking good :)")
     if args.release:
-        _file_exists_in_current_folder("package.json")
-        Release(args.prefix, args.pypi).release()
+        Release(
+            args.prefix, args.pypi, args.ls_files, fsmonitor=args.fsmonitor
+        ).release()
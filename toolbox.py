@@ -1,5 +1,14 @@
 import click
+import glob
+import hashlib
+import json
+import multiprocessing
+import os
+import re
 import subprocess
+import sys
+import time
+import yaml
 
 from lib.dev.folder import get_pillar_folder
 from lib.server.name import (
@@ -8,9 +17,256 @@ from lib.server.name import (
 )
 from lib.site.info import SiteInfo
 
+# e.g. '  Full    Mon Oct 12 01:00:03 2026    2'
+BACKUP_SET = re.compile(
+    r'^\s*(Full|Incremental)\s+(\w{3} \w{3}\s+\d+ [\d:]+ \d{4})\s+(\d+)\s*$'
+)
+CACHE_FOLDER = os.path.join(os.path.expanduser('~'), '.cache', 'toolbox')
+# seconds (use the cached 'collection-status' for a repo)
+CACHE_TTL = 3600
 CYAN = 'cyan'
+GREEN = 'green'
+RED = 'red'
 YELLOW = 'yellow'
 WHITE = 'white'
+# number of sites to check at the same time (--all, --sites-file)
+JOBS = 4
+# seconds (for each site)
+TIMEOUT = 300
+# seconds (more than the timeout) to wait for a site in the process pool
+TIMEOUT_GRACE = 30
+
+
+def _cache_file_name(repo, extension='json'):
+    """The cache for a repo (see '_collection_status_cached')."""
+    name = hashlib.sha256(repo.encode()).hexdigest()[:16]
+    return os.path.join(
+        CACHE_FOLDER, 'collection-status-{}.{}'.format(name, extension)
+    )
+
+
+def _cache_load(repo):
+    result = None
+    file_name = _cache_file_name(repo)
+    if os.path.exists(file_name):
+        with open(file_name) as f:
+            data = json.load(f)
+        if data['repo'] == repo:
+            result = data
+    return result
+
+
+def _cache_save(repo, status):
+    """Save the status (and forget any refresh error)."""
+    return _cache_write(repo, {
+        'repo': repo,
+        'created': time.time(),
+        'status': status,
+        'refreshed': None,
+        'refresh_error': None,
+    })
+
+
+def _cache_save_error(repo, error):
+    """A background refresh failed, so keep the old status with the error
+    (see '_summary').
+
+    """
+    data = _cache_load(repo)
+    if data:
+        data['refreshed'] = time.time()
+        data['refresh_error'] = error
+        _cache_write(repo, data)
+
+
+def _cache_write(repo, data):
+    """Write to a temporary file, so a reader never sees a partial file."""
+    file_name = _cache_file_name(repo)
+    os.makedirs(CACHE_FOLDER, exist_ok=True)
+    temp_file_name = '{}.{}'.format(file_name, os.getpid())
+    with open(temp_file_name, 'w') as f:
+        json.dump(data, f)
+    os.replace(temp_file_name, file_name)
+    return data
+
+
+def _collection_status(site_name, live, what, pillar_folder, timeout, ttl):
+    """Get the collection status for a site (in a separate process).
+
+    The sites are checked at the same time, so nothing is displayed.  The
+    result is returned as a 'dict' for the summary table.
+
+    """
+    result = _collection_status_row(site_name)
+    start = time.time()
+    try:
+        server_name = _server_name(
+            site_name, live, pillar_folder, verbose=False
+        )
+        result['server_name'] = server_name
+        site_info = SiteInfo(server_name, site_name)
+        repo = _repo(site_info, site_name, what, verbose=False)
+        cache = _collection_status_cached(repo, timeout, ttl)
+        result['age'] = time.time() - cache['created']
+        result['collection'] = cache['status']
+        if cache.get('refresh_error'):
+            result['status'] = 'stale'
+            result['error'] = 'refresh failed ({}): {}'.format(
+                _format_time(cache['refreshed']), cache['refresh_error']
+            )
+    except subprocess.TimeoutExpired:
+        result['status'] = 'timeout'
+        result['error'] = 'more than {} seconds'.format(timeout)
+    except Exception as e:
+        result['status'] = 'error'
+        result['error'] = str(e)
+    result['seconds'] = time.time() - start
+    return result
+
+
+def _collection_status_row(site_name):
+    """A row for the summary table (see '_summary')."""
+    return {
+        'site_name': site_name,
+        'server_name': None,
+        'status': 'ok',
+        'seconds': None,
+        'age': None,
+        'collection': None,
+        'error': None,
+    }
+
+
+def _collection_status_cached(repo, timeout, ttl):
+    """The collection status for a repo from the cache.
+
+    If the cache is older than 'ttl' seconds, the old status is returned and
+    the cache is refreshed in the background (see '_refresh_background').
+    If there is nothing in the cache (or 'ttl' is '0'), 'duplicity' is run
+    and we wait for the result.
+
+    """
+    result = None
+    if ttl:
+        result = _cache_load(repo)
+    if result:
+        if time.time() - result['created'] > ttl:
+            _refresh_background(repo, timeout)
+    else:
+        result = _cache_save(repo, _collection_status_run(repo, timeout))
+    return result
+
+
+def _collection_status_run(repo, timeout):
+    out = subprocess.run(
+        ['duplicity', 'collection-status', repo],
+        # don't wait for a passphrase (the sites are checked at the same time)
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+        timeout=timeout,
+        # the backup times are parsed, so don't translate the output
+        env=dict(os.environ, LC_ALL='C'),
+    )
+    if out.returncode:
+        raise Exception(
+            "Cannot get collection status [{}]: {}".format(
+                out.returncode, out.stderr.strip()
+            )
+        )
+    return _parse_collection_status(out.stdout)
+
+
+def _collection_status_all(site_names, live, what, jobs, timeout, ttl):
+    result = []
+    pillar_folder = get_pillar_folder()
+    click.secho(
+        'collection-status for {} sites ({} at a time)'.format(
+            len(site_names), jobs
+        ),
+        fg=WHITE,
+        bold=True,
+    )
+    # 'multiprocessing.Pool' (rather than 'ProcessPoolExecutor'), so we can
+    # 'terminate' a site which does not finish
+    pool = multiprocessing.Pool(processes=jobs)
+    is_timeout = False
+    try:
+        pending = [
+            pool.apply_async(
+                _collection_status,
+                (site_name, live, what, pillar_folder, timeout, ttl),
+            )
+            for site_name in site_names
+        ]
+        for site_name, async_result in zip(site_names, pending):
+            try:
+                row = async_result.get(timeout=timeout + TIMEOUT_GRACE)
+            except multiprocessing.TimeoutError:
+                is_timeout = True
+                row = _collection_status_row(site_name)
+                row['status'] = 'timeout'
+                row['seconds'] = timeout + TIMEOUT_GRACE
+                row['error'] = 'did not finish in {} seconds'.format(
+                    row['seconds']
+                )
+            click.secho(
+                '{}: {}'.format(row['site_name'], row['status']),
+                fg=GREEN if row['status'] == 'ok' else RED,
+            )
+            result.append(row)
+    finally:
+        if is_timeout:
+            pool.terminate()
+        else:
+            pool.close()
+        pool.join()
+    return result
+
+
+def _display_collection(status):
+    click.secho(
+        'chains: {}, full: {}, incremental: {}, volumes: {}'.format(
+            len(status['chains']),
+            status['full'],
+            status['incremental'],
+            status['volumes'],
+        ),
+        fg=CYAN,
+    )
+    click.secho(
+        'last full backup: {} ({})'.format(
+            _format_time(status['last_full']),
+            _format_hours(status['last_full']),
+        ),
+        fg=CYAN,
+    )
+    click.secho(
+        'last backup: {} ({})'.format(
+            _format_time(status['last_backup']),
+            _format_hours(status['last_backup']),
+        ),
+        fg=CYAN,
+    )
+
+
+def _format_hours(seconds_since_epoch):
+    result = 'never'
+    if seconds_since_epoch:
+        result = '{:.1f} hours ago'.format(
+            (time.time() - seconds_since_epoch) / 3600
+        )
+    return result
+
+
+def _format_time(seconds_since_epoch):
+    result = '-'
+    if seconds_since_epoch:
+        result = time.strftime(
+            '%Y-%m-%d %H:%M', time.localtime(seconds_since_epoch)
+        )
+    return result
 
 
 def _heading(site_name, op):
@@ -25,19 +281,131 @@ def _heading(site_name, op):
     click.secho('{}: {}'.format(h, site_name), fg=WHITE, bold=True)
 
 
-def _list(repo):
-    result = subprocess.call([
-        'duplicity',
-        'collection-status',
-        repo
-    ])
-    if result:
-        raise Exception("Cannot get collection status [{}].".format(result))
+def _list(repo, timeout):
+    """Run 'collection-status' (and save the result to the cache)."""
+    status = _collection_status_run(repo, timeout)
+    _cache_save(repo, status)
+    _display_collection(status)
+
+
+def _parse_collection_status(output):
+    """Parse the output from 'duplicity collection-status'.
+
+    Each chain (primary and secondary) starts with 'Chain start time' and
+    has a list of backup sets e.g::
+
+      Chain start time: Mon Oct 12 01:00:03 2026
+      ...
+       Type of backup set:                            Time:      Num volumes:
+                      Full         Mon Oct 12 01:00:03 2026                 2
+               Incremental         Tue Oct 13 01:00:02 2026                 1
+
+    The times are seconds since the epoch (so they can be saved as JSON).
+
+    """
+    chains = []
+    for line in output.splitlines():
+        if line.startswith('Chain start time:'):
+            chains.append({
+                'full': 0,
+                'incremental': 0,
+                'volumes': 0,
+                'start': None,
+                'end': None,
+            })
+            continue
+        match = BACKUP_SET.match(line)
+        if match and chains:
+            backup_type, backup_time, volumes = match.groups()
+            seconds = time.mktime(
+                time.strptime(
+                    ' '.join(backup_time.split()), '%a %b %d %H:%M:%S %Y'
+                )
+            )
+            chain = chains[-1]
+            chain[backup_type.lower()] += 1
+            chain['volumes'] += int(volumes)
+            chain['start'] = min(seconds, chain['start'] or seconds)
+            chain['end'] = max(seconds, chain['end'] or seconds)
+    last_full = [x['start'] for x in chains if x['full']]
+    return {
+        'chains': chains,
+        'full': sum(x['full'] for x in chains),
+        'incremental': sum(x['incremental'] for x in chains),
+        'volumes': sum(x['volumes'] for x in chains),
+        'last_backup': max((x['end'] for x in chains), default=None),
+        'last_full': max(last_full, default=None),
+    }
+
+
+def _pillar_site_names(pillar_folder):
+    """The site names from the 'sites' in the pillar (e.g. 'sites/*.sls')."""
+    result = set()
+    for file_name in sorted(glob.glob(
+            os.path.join(pillar_folder, 'sites', '*.sls'))):
+        with open(file_name) as f:
+            try:
+                data = yaml.safe_load(f)
+            except yaml.YAMLError as e:
+                click.secho('Cannot read {}: {}'.format(file_name, e), fg=RED)
+                continue
+        if data and isinstance(data.get('sites'), dict):
+            result.update(data['sites'].keys())
+    return sorted(result)
+
 
+def _refresh(repo, timeout):
+    """Refresh the cache for a repo (run by '_refresh_background').
 
-def _repo(site_info, site_name, what):
+    Nobody sees the output from this process, so an error is saved in the
+    cache.
+
+    """
+    try:
+        _cache_save(repo, _collection_status_run(repo, timeout))
+    except subprocess.TimeoutExpired:
+        _cache_save_error(repo, 'more than {} seconds'.format(timeout))
+    except Exception as e:
+        _cache_save_error(repo, str(e))
+    finally:
+        os.remove(_cache_file_name(repo, 'lock'))
+
+
+def _refresh_background(repo, timeout):
+    """Refresh the cache for a repo in a detached process.
+
+    A lock file stops us starting a second refresh for the same repo (unless
+    the lock is older than the timeout).
+
+    """
+    lock = _cache_file_name(repo, 'lock')
+    try:
+        os.close(os.open(lock, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+    except FileExistsError:
+        if time.time() - os.path.getmtime(lock) < timeout:
+            return
+        os.utime(lock)
+    subprocess.Popen(
+        [
+            sys.executable,
+            '-c',
+            'import sys; sys.path.insert(0, sys.argv[1]); '
+            'import toolbox; toolbox._refresh(sys.argv[2], int(sys.argv[3]))',
+            os.path.dirname(os.path.abspath(__file__)),
+            repo,
+            str(timeout),
+        ],
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        start_new_session=True,
+    )
+
+
+def _repo(site_info, site_name, what, verbose=True):
     result = '{}{}/{}'.format(site_info.rsync_ssh, site_name, what)
-    click.secho(result, fg=CYAN)
+    if verbose:
+        click.secho(result, fg=CYAN)
     return result
 
 
@@ -58,31 +426,161 @@ def _restore(repo, gpg_password):
         raise Exception("Cannot restore data [{}].".format(result))
 
 
-def _server_name(site_name, live, pillar_folder):
+def _server_name(site_name, live, pillar_folder, verbose=True):
     result = None
     if live:
-        click.secho('is ALIVE!', fg=YELLOW, bold=True)
+        if verbose:
+            click.secho('is ALIVE!', fg=YELLOW, bold=True)
         result = get_server_name_live(pillar_folder, site_name)
     else:
-        click.secho('testing, testing...', fg=CYAN, bold=True)
+        if verbose:
+            click.secho('testing, testing...', fg=CYAN, bold=True)
         result = get_server_name_test(pillar_folder, site_name)
-    click.secho('server_name: {}'.format(result), fg=CYAN)
+    if verbose:
+        click.secho('server_name: {}'.format(result), fg=CYAN)
+    return result
+
+
+def _site_names(file_name):
+    """One site name on each line (ignore blank lines and comments)."""
+    result = []
+    with open(file_name) as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith('#'):
+                result.append(line)
+    return result
+
+
+def _summary(rows, stale):
+    """Display a summary table.  Returns the number of sites which failed.
+
+    If 'stale' (hours) is set, only display the sites with no backup in the
+    last 'stale' hours (a site which failed is also stale).
+
+    """
+    if stale is not None:
+        since = time.time() - stale * 3600
+        rows = [
+            row for row in rows
+            if row['status'] != 'ok'
+            or (row['collection']['last_backup'] or 0) < since
+        ]
+        click.echo()
+        click.secho(
+            '{} sites with no backup in {}h'.format(len(rows), stale),
+            fg=RED if rows else GREEN,
+            bold=True,
+        )
+    click.echo()
+    click.secho(
+        '{:<30} {:<10} {:>6} {:>6} {:>6} {:>7}  {:<16} {:>10}  {}'.format(
+            'site',
+            'status',
+            'chains',
+            'full',
+            'incr',
+            'volumes',
+            'last backup',
+            'hours ago',
+            'cache',
+        ),
+        fg=WHITE,
+        bold=True,
+    )
+    for row in rows:
+        status = row['collection']
+        if status:
+            click.secho(
+                '{:<30} {:<10} {:>6} {:>6} {:>6} {:>7}  {:<16} {:>10}  '
+                '{:.0f} min'.format(
+                    row['site_name'],
+                    row['status'],
+                    len(status['chains']),
+                    status['full'],
+                    status['incremental'],
+                    status['volumes'],
+                    _format_time(status['last_backup']),
+                    '{:.1f}'.format(
+                        (time.time() - status['last_backup']) / 3600
+                    ) if status['last_backup'] else 'never',
+                    row['age'] / 60,
+                ),
+                fg=(
+                    RED if row['status'] != 'ok'
+                    else GREEN if status['last_backup'] else YELLOW
+                ),
+            )
+            if row['error']:
+                click.secho(
+                    '{:<30} stale, {}'.format('', row['error']), fg=RED
+                )
+        else:
+            click.secho(
+                '{:<30} {:<10} {}'.format(
+                    row['site_name'], row['status'], row['error'] or ''
+                ),
+                fg=RED,
+            )
+    result = len([row for row in rows if row['status'] != 'ok'])
+    if stale is None:
+        click.echo()
+        click.secho(
+            '{} of {} sites failed'.format(result, len(rows)),
+            fg=RED if result else GREEN,
+            bold=True,
+        )
+    else:
+        result = len(rows)
     return result
 
 
 @click.command()
-@click.option('-s', '--site-name', prompt=True)
+@click.option('-s', '--site-name')
+@click.option('--all', 'all_sites', is_flag=True,
+              help='List the collection status for every site in the pillar')
+@click.option('--sites-file', type=click.Path(exists=True, dir_okay=False),
+              help='List the collection status for the sites in this file')
+@click.option('--jobs', default=JOBS,
+              help='Number of sites to check at the same time')
+@click.option('--timeout', default=TIMEOUT,
+              help='Timeout (in seconds) for each site')
+@click.option('--ttl', default=CACHE_TTL,
+              help='Refresh the cached status (in the background) if it is '
+                   'older than this (in seconds)')
+@click.option('--no-cache', is_flag=True,
+              help='Run collection-status for every site (ignore the cache)')
+@click.option('--stale', type=float,
+              help='Only display the sites with no backup in this many hours')
 @click.option('--live/--test', default=False)
 @click.option('--op', type=click.Choice(['list', 'restore']), default='list')
 @click.option('--what', type=click.Choice(['backup', 'files']), prompt=True)
-def cli(site_name, live, op, what):
+def cli(site_name, all_sites, sites_file, jobs, timeout, ttl, no_cache, stale,
+        live, op, what):
+    if all_sites or sites_file:
+        if op != 'list':
+            raise click.UsageError(
+                "'--all' and '--sites-file' can only be used with '--op list'"
+            )
+        if sites_file:
+            site_names = _site_names(sites_file)
+        else:
+            site_names = _pillar_site_names(get_pillar_folder())
+        rows = _collection_status_all(
+            site_names, live, what, jobs, timeout, 0 if no_cache else ttl
+        )
+        if _summary(rows, stale):
+            raise SystemExit(1)
+        return
+    if not site_name:
+        site_name = click.prompt('Site name')
     _heading(site_name, op)
     pillar_folder = get_pillar_folder()
     server_name = _server_name(site_name, live, pillar_folder)
     site_info = SiteInfo(server_name, site_name)
     repo = _repo(site_info, site_name, what)
     if op == 'list':
-        _list(repo)
+        _list(repo, timeout)
     elif op == 'restore':
         _restore(repo, site_info.rsync_gpg_password)
     click.echo()